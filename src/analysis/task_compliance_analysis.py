@@ -1,37 +1,41 @@
+from functools import partial
+
 import pandas as pd
 import pytask
 
 from src.config import BLD
+from src.config import COMPLIANCE_ORDERED_DISTR
+from src.config import X_VAR_CATEGORIES
+from src.data_management.columnar_store import read_columnar
+from src.data_management.columnar_store import to_columnar
+from src.model_code.descriptive_stats import describe
+from src.model_code.format_result import fit_info_format
+from src.model_code.format_result import grid_results_format
 from src.model_code.format_result import odds_radio_format
 from src.model_code.format_result import sm_results_format
 from src.model_code.regression import ols_regression_formula
+from src.model_code.regression import ordered_start_params
+from src.model_code.regression import ordered_start_params_design
+from src.model_code.regression import ordinal_logit_regression_design
 from src.model_code.regression import ordinal_logit_regression_formula
+from src.model_code.spec_grid import run_grid
 
 
-@pytask.mark.depends_on(
-    {
-        "background": BLD / "data" / "liss" / "background.pickle",
-        "compliance": BLD / "data" / "liss" / "compliance.pickle",
-        "work_status": BLD / "data" / "liss" / "work_status.pickle",
-    }
-)
+@pytask.mark.depends_on(BLD / "data" / "liss" / "compliance_panel.parquet")
 @pytask.mark.produces(BLD / "tables" / "stat_compliance_x_var.csv")
 def task_stat_compliance_x_var(depends_on, produces):
-    compliance = (
-        pd.read_pickle(depends_on["compliance"])
-        .reset_index(level="month", drop=True)
-        .drop(columns="Month")
-    )
-    work_status = (
-        pd.read_pickle(depends_on["work_status"])
-        .query("month == '2020-04-01'")
-        .reset_index(level="month", drop=True)
-        .drop(columns="Month")
-    )
-    background = pd.read_pickle(depends_on["background"])
-    merge_data = compliance.join(background, on="personal_id", how="inner").join(
-        work_status, on="personal_id", how="inner"
-    )
+    merge_data = read_columnar(
+        depends_on,
+        [
+            "female",
+            "living_alone",
+            "living_with_children",
+            "edu",
+            "age_cut",
+            "occupation",
+            "income_hh_cut",
+        ],
+    ).reset_index(level="month", drop=True)
 
     # x_var = dmatrix(
     #     "female + living_alone + living_with_children + age_cut + edu + occupation + income_hh_cut"
@@ -40,129 +44,80 @@ def task_stat_compliance_x_var(depends_on, produces):
     #     return_type="dataframe",
     # ).drop(columns="Intercept")
 
-    x_var = merge_data[["female", "living_alone", "living_with_children"]]
-
-    # change category to dummy
-    x_var = x_var.join(
-        pd.get_dummies(
-            merge_data["edu"].cat.remove_unused_categories(),
-            prefix="edu",
-            drop_first=False,
-            prefix_sep=":",
-        )
-    )
-    x_var = x_var.join(
-        pd.get_dummies(
-            merge_data["age_cut"], prefix="age", drop_first=False, prefix_sep=":"
-        )
-    )
-    x_var = x_var.join(
-        pd.get_dummies(
-            merge_data["occupation"],
-            prefix="occupation",
-            drop_first=False,
-            prefix_sep=":",
-        )
-    )
-    x_var = x_var.join(
-        pd.get_dummies(
-            merge_data["income_hh_cut"],
-            prefix="income_hh",
-            drop_first=False,
-            prefix_sep=":",
-        )
-    )
-
     x_var = (
-        x_var.reset_index(level="personal_id")
+        merge_data.reset_index(level="personal_id")
         .drop_duplicates(inplace=False)
-        .drop(columns="personal_id")
+        .assign(edu=lambda x: x["edu"].cat.remove_unused_categories())
     )
-    df_desc_stat = pd.DataFrame(
-        {
-            "Observations": x_var.count(),
-            "Mean": x_var.mean(),
-            "Std": x_var.std(),
-            "Min": x_var.min(),
-            "Max": x_var.max(),
-            "Sum": x_var.sum(),
-        }
+    df_desc_stat = describe(
+        x_var,
+        ["female", "living_alone", "living_with_children"],
+        categorical=X_VAR_CATEGORIES,
     )
     df_desc_stat.to_csv(produces, float_format="%.3f")
 
 
 @pytask.mark.depends_on(
     {
-        "background": BLD / "data" / "liss" / "background.pickle",
-        "compliance": BLD / "data" / "liss" / "compliance.pickle",
+        "background": BLD / "data" / "liss" / "background.parquet",
+        "compliance": BLD / "data" / "liss" / "compliance.parquet",
     }
 )
 @pytask.mark.produces(BLD / "tables" / "stat_compliance_y_var.csv")
 def task_stat_compliance_y_var(depends_on, produces):
-    compliance = pd.read_pickle(depends_on["compliance"]).reset_index(["month"])
-    background = pd.read_pickle(depends_on["background"])
+    compliance = read_columnar(
+        depends_on["compliance"], ["compliance_index", "Month"]
+    ).reset_index(["month"])
+    background = read_columnar(depends_on["background"], ["hh_id"])
     merge_data = compliance.join(background, on="personal_id", how="inner")
-    y_var = merge_data[["compliance_index", "month", "Month"]]
     stat_y = (
-        pd.DataFrame(
-            {
-                "Observations": y_var.groupby(["Month", "month"]).count()[
-                    "compliance_index"
-                ],
-                "Total": y_var.groupby(["Month", "month"]).sum()["compliance_index"],
-                "Mean": y_var.groupby(["Month", "month"]).mean()["compliance_index"],
-                "Std": y_var.groupby(["Month", "month"]).std()["compliance_index"],
-                "Min": y_var.groupby(["Month", "month"]).min()["compliance_index"],
-                "Max": y_var.groupby(["Month", "month"]).max()["compliance_index"],
-            }
-        )
-        .sort_index(level="month")
-        .reset_index("month", drop=True)
+        describe(merge_data, ["compliance_index"], by=["month", "Month"])
+        .droplevel(["month", "variable"])
+        .rename(columns={"Sum": "Total"})[
+            ["Observations", "Total", "Mean", "Std", "Min", "Max"]
+        ]
     )
     stat_y.to_csv(produces, float_format="%.3f")
 
 
-@pytask.mark.depends_on(
-    {
-        "background": BLD / "data" / "liss" / "background.pickle",
-        "compliance": BLD / "data" / "liss" / "compliance.pickle",
-        "work_status": BLD / "data" / "liss" / "work_status.pickle",
-    }
-)
+@pytask.mark.depends_on(BLD / "data" / "liss" / "compliance_panel.parquet")
 @pytask.mark.produces(
     {
         "regression": BLD / "tables" / "compliance_ordered_logit.csv",
         "odds_radio": BLD / "tables" / "compliance_ordered_logit_OR.csv",
+        "fit_info": BLD / "tables" / "compliance_ordered_logit_fit_info.csv",
     }
 )
 def task_compliance_ordinal_regression(depends_on, produces):
-    # merge data
-    compliance = (
-        pd.read_pickle(depends_on["compliance"])
-        .reset_index(level="month", drop=True)
-        .drop(columns="Month")
-    )
-    work_status = (
-        pd.read_pickle(depends_on["work_status"])
-        .query("month == '2020-04-01'")
-        .reset_index(level="month", drop=True)
-        .drop(columns="Month")
-    )
-    background = pd.read_pickle(depends_on["background"])
-    merge_data = compliance.join(background, on="personal_id", how="inner").join(
-        work_status, on="personal_id", how="inner"
-    )
+    merge_data = read_columnar(
+        depends_on,
+        [
+            "compliance_index",
+            "female",
+            "living_alone",
+            "living_with_children",
+            "age",
+            "edu",
+            "occupation",
+            "net_income_hh_eqv",
+            "hh_id",
+        ],
+    ).reset_index(level="month", drop=True)
 
     # run regression
-    formula = (
-        "compliance_index ~ female + living_alone + living_with_children + age + I(age**2) + "
-        "edu + occupation + net_income_hh_eqv"
-        " + female*edu"
+    formula = _compliance_ordinal_regression_formula()
+    # the OLS fit gives the starting values of the ordered model
+    # standard errors are clustered by household
+    ols_result, _ = ols_regression_formula(
+        merge_data, formula, groups=merge_data["hh_id"]
     )
     ordinal_result, _, ordinal_odds_radio = ordinal_logit_regression_formula(
-        merge_data, formula
+        merge_data,
+        formula,
+        start_params=ordered_start_params(ols_result, distr=COMPLIANCE_ORDERED_DISTR),
+        groups=merge_data["hh_id"],
+        distr=COMPLIANCE_ORDERED_DISTR,
     )
-    ols_result, _ = ols_regression_formula(merge_data, formula)
 
     formed_odds_radios = odds_radio_format([ordinal_odds_radio], ["Odds Ratio"])
     formed_result = sm_results_format(
@@ -175,6 +130,62 @@ def task_compliance_ordinal_regression(depends_on, produces):
         produces["regression"], float_format="%.3f"
     )
     formed_odds_radios.to_csv(produces["odds_radio"], float_format="%.3f")
+    fit_info_format([ordinal_result], ["Ordered Logit"]).to_csv(
+        produces["fit_info"], float_format="%.3f"
+    )
+
+
+@pytask.mark.depends_on(BLD / "data" / "liss" / "compliance_panel.parquet")
+@pytask.mark.produces(BLD / "analysis" / "compliance_specification_grid.parquet")
+def task_compliance_specification_grid(depends_on, produces):
+    merge_data = read_columnar(
+        depends_on,
+        [
+            "compliance_index",
+            "female",
+            "living_alone",
+            "living_with_children",
+            "age",
+            "age_cut",
+            "edu",
+            "occupation",
+            "net_income_hh_eqv",
+            "hh_id",
+        ],
+    ).reset_index(level="month", drop=True)
+    formula = _compliance_ordinal_regression_formula()
+    # variants with the interactions tried in _get_compliance_XY
+    formulas = {
+        "baseline": formula,
+        "edu_x_age": formula + " + edu:age_cut",
+        "living_alone_x_age": formula + " + living_alone:age_cut",
+    }
+    samples = {
+        "Pooled": None,
+        "Female": "female == 1",
+        "Male": "female == 0",
+        "Employed": "occupation == 'employed'",
+        "Unemployed": "occupation == 'unemployed'",
+    }
+    results = run_grid(
+        merge_data,
+        formulas,
+        samples,
+        ordinal_logit_regression_design,
+        # the ordered fits are warm-started from OLS fits, like the main model
+        start=partial(ordered_start_params_design, distr=COMPLIANCE_ORDERED_DISTR),
+        groups=merge_data["hh_id"],
+        distr=COMPLIANCE_ORDERED_DISTR,
+    )
+    to_columnar(grid_results_format(results), produces)
+
+
+def _compliance_ordinal_regression_formula():
+    return (
+        "compliance_index ~ female + living_alone + living_with_children + age + I(age**2) + "
+        "edu + occupation + net_income_hh_eqv"
+        " + female*edu"
+    )
 
 
 def _get_compliance_XY(merge_data):
@@ -1,61 +1,88 @@
+import numpy as np
 import pandas as pd
 import pytask
 
 from src.config import BLD
+from src.data_management.columnar_store import read_columnar
+from src.data_management.columnar_store import to_columnar
+from src.model_code.bootstrap import cluster_bootstrap
+from src.model_code.format_result import grid_results_format
+from src.model_code.format_result import odds_radio_ci_format
 from src.model_code.format_result import odds_radio_format
 from src.model_code.format_result import sm_results_format
-from src.model_code.regression import binomial_logit_regression_formula
+from src.model_code.regression import binomial_logit_regression_design
+from src.model_code.regression import binomial_logit_regression_subsets
+from src.model_code.regression import design_matrices
+from src.model_code.regression import get_odds_radio
+from src.model_code.regression import subset_design
+from src.model_code.spec_grid import run_grid
 
 
-@pytask.mark.depends_on(
-    {
-        "background": BLD / "data" / "liss" / "background.pickle",
-        "compliance": BLD / "data" / "liss" / "compliance.pickle",
-        "infected": BLD / "data" / "liss" / "infected.pickle",
-        "work_status": BLD / "data" / "liss" / "work_status.pickle",
-    }
-)
+@pytask.mark.depends_on(BLD / "data" / "liss" / "infected_panel.parquet")
 @pytask.mark.produces(
     {
         "regression": BLD / "tables" / "infected_with_compliance_logit.csv",
         "odds_radio": BLD / "tables" / "infected_with_compliance_logit_OR.csv",
+        "odds_radio_ci": BLD / "tables" / "infected_with_compliance_logit_OR_CI.csv",
     }
 )
 def task_infected_with_compliance_binomial_regression(depends_on, produces):
-    compliance = pd.read_pickle(depends_on["compliance"])[
-        "compliance_index"
-    ].reset_index(level="month", drop=True)
-    infected = pd.read_pickle(depends_on["infected"])
-    work_status = pd.read_pickle(depends_on["work_status"])
-    background = pd.read_pickle(depends_on["background"])
-    merge_data = (
-        infected.join(background, on="personal_id", how="inner")
-        .join(compliance, on="personal_id", how="inner")
-        .join(work_status, on=["personal_id", "month"], how="inner")
+    merge_data = read_columnar(
+        depends_on,
+        [
+            "infected",
+            "compliance_index",
+            "female",
+            "living_alone",
+            "living_with_children",
+            "age_cut",
+            "edu",
+            "occupation",
+            "income_hh_group",
+            "hh_id",
+            "Month",
+        ],
     )
-    merge_data = merge_data.sort_index(level=["personal_id", "month"])
+    # standard errors and bootstrap draws are clustered by household
+    hh_id = merge_data["hh_id"]
 
-    model_names = (
-        merge_data.index.get_level_values("month")
-        .drop_duplicates()
-        .sort_values()
-        .month_name()
-        .tolist()
-    )
-    results = []
-    odds_radios = []
-    for month in model_names:  # noqa:B007
-        merge_data_month = merge_data.query("Month == @month")
-        result, summary, odds_radio = _infected_binomial_regression_formula(
-            merge_data_month
+    design = design_matrices(merge_data, _infected_binomial_regression_formula())
+    # the monthly models are keyed by period, a month name can occur in several
+    # years; they are named by the Month label of their period
+    labels = dict(
+        zip(
+            pd.PeriodIndex(merge_data.index.get_level_values("month"), freq="M"),
+            merge_data["Month"],
         )
-        results.append(result)
-        odds_radios.append(odds_radio)
+    )
+    periods = pd.PeriodIndex(design[1].index.get_level_values("month"), freq="M")
+    model_periods = periods.unique().sort_values()
+    model_names = [labels[period] for period in model_periods]
+    masks = [periods == period for period in model_periods]
 
-    result, summary, odds_radio = _infected_binomial_regression_formula(merge_data)
+    # the disjoint monthly models are fitted together by the batched solver, the
+    # pooled model is fitted on its own, starting at the mean of the monthly
+    # estimates weighted by their observations; the fits and the bootstrap
+    # replicates are cached, so months whose data did not change are not fitted again
+    results = binomial_logit_regression_subsets(design, masks, groups=hh_id)
+    monthly = [result for result in results if result is not None]
+    start_params = np.average(
+        [result.params for result in monthly],
+        axis=0,
+        weights=[result.nobs for result in monthly],
+    )
+    pooled, _, _ = binomial_logit_regression_design(
+        design, groups=hh_id, start_params=start_params
+    )
+    results.append(pooled)
     model_names.append("Pooled")
-    results.append(result)
-    odds_radios.append(odds_radio)
+    designs = [subset_design(design, mask) for mask in masks] + [design]
+    odds_radios = [
+        get_odds_radio(
+            result, cluster_bootstrap(design, hh_id, start_params=result.params)
+        )
+        for design, result in zip(designs, results)
+    ]
 
     formated_result = sm_results_format(results, model_names)
     formated_odds_radios = odds_radio_format(odds_radios, model_names)
@@ -66,9 +93,59 @@ def task_infected_with_compliance_binomial_regression(depends_on, produces):
     # with open(produces['regression'], 'w') as f:
     #     f.write(formated_result.as_latex())
     formated_odds_radios.to_csv(produces["odds_radio"], float_format="%.3f")
+    odds_radio_ci_format(odds_radios, model_names).to_csv(
+        produces["odds_radio_ci"], float_format="%.3f"
+    )
+
+
+@pytask.mark.depends_on(BLD / "data" / "liss" / "infected_panel.parquet")
+@pytask.mark.produces(BLD / "analysis" / "infected_specification_grid.parquet")
+def task_infected_specification_grid(depends_on, produces):
+    merge_data = read_columnar(
+        depends_on,
+        [
+            "infected",
+            "compliance_index",
+            "female",
+            "living_alone",
+            "living_with_children",
+            "age_cut",
+            "edu",
+            "occupation",
+            "income_hh_group",
+            "hh_id",
+            "Month",
+        ],
+    )
+    formula = _infected_binomial_regression_formula()
+    # variants with the interactions tried in _infected_binomial_regression_formula
+    formulas = {
+        "baseline": formula,
+        "edu_x_age": formula + " + edu:age_cut",
+        "living_alone_x_age": formula + " + living_alone:age_cut",
+        "compliance_x_age_x_living_alone": formula
+        + " + compliance_index*age_cut*living_alone",
+    }
+    months = merge_data["Month"].cat.remove_unused_categories().cat.categories
+    samples = {
+        **{month: f"Month == '{month}'" for month in months},
+        "Pooled": None,
+        "Female": "female == 1",
+        "Male": "female == 0",
+        "Employed": "occupation == 'employed'",
+        "Unemployed": "occupation == 'unemployed'",
+    }
+    results = run_grid(
+        merge_data,
+        formulas,
+        samples,
+        binomial_logit_regression_design,
+        groups=merge_data["hh_id"],
+    )
+    to_columnar(grid_results_format(results), produces)
 
 
-def _infected_binomial_regression_formula(merge_data):
+def _infected_binomial_regression_formula():
 
     formula = (
         "infected ~ compliance_index + female + living_alone + living_with_children + age_cut + "
@@ -79,9 +156,7 @@ def _infected_binomial_regression_formula(merge_data):
 
     # x['edu:tertiary # age:[50, 75)'] = x['age:[50, 75)'] * x['edu:tertiary']
     # x['living_alone # age:[25, 50)'] = x['age:[25, 50)'] * x['living_alone']
-    # add_interaction(x, 'age:[50, 75)', 'edu:tertiary')
-    # add_interaction(x, 'compliance_index', 'age:[25, 50)', 'living_alone')
+    # x = add_interaction(x, 'age:[50, 75)', 'edu:tertiary')
+    # x = add_interaction(x, 'compliance_index', 'age:[25, 50)', 'living_alone')
 
-    # run regression
-    result, summary, odds_radio = binomial_logit_regression_formula(merge_data, formula)
-    return result, summary, odds_radio
+    return formula
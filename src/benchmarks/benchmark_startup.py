@@ -0,0 +1,94 @@
+"""Startup budget of the pytask build.
+
+pytask imports every ``task_*.py`` module when it collects the build, before any task
+runs, so a build which has nothing to do still pays for these imports. This benchmark
+imports all task modules in fresh interpreters, takes the fastest of several runs and
+fails if it exceeds the budget or if one of the libraries which should only be loaded
+when a model is fitted was imported::
+
+    python -m src.benchmarks.benchmark_startup
+    python -m src.benchmarks.benchmark_startup --budget 1.5 --runs 5
+
+The time includes the imports of pandas and pytask, which every build needs.
+
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+from src.config import ROOT
+from src.config import SRC
+
+# seconds for importing all task modules, pandas and pytask
+BUDGET_SECONDS = 2.0
+# libraries which are imported inside the functions fitting models
+DEFERRED_MODULES = ["statsmodels", "patsy", "scipy"]
+
+_IMPORT_TASK_MODULES = """
+import importlib
+import json
+import sys
+import time
+
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def measure_startup(runs=3):
+    """Import all task modules in fresh interpreters.
+
+    Args:
+        runs (int): Number of interpreters, the fastest run counts.
+
+    Returns:
+        dict: Seconds of the fastest run and the deferred libraries it imported.
+
+    """
+    module_names = [
+        ".".join(path.relative_to(ROOT).with_suffix("").parts)
+        for path in sorted(SRC.rglob("task_*.py"))
+    ]
+    measurements = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_TASK_MODULES, *module_names],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        measurements.append(json.loads(output.splitlines()[-1]))
+    fastest = min(measurements, key=lambda measured: measured["seconds"])
+    imported = {module.split(".")[0] for module in fastest["modules"]}
+    return {
+        "seconds": fastest["seconds"],
+        "deferred_imported": [name for name in DEFERRED_MODULES if name in imported],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    measured = measure_startup(args.runs)
+    print(json.dumps(measured, indent=2))
+    failures = []
+    if measured["seconds"] > args.budget:
+        failures.append(
+            f"importing the task modules took {measured['seconds']:.2f}s, "
+            f"budget {args.budget:.2f}s"
+        )
+    if measured["deferred_imported"]:
+        failures.append(
+            "the task modules import " + ", ".join(measured["deferred_imported"])
+        )
+    if failures:
+        sys.exit("Startup budget exceeded:\n" + "\n".join(failures))
@@ -0,0 +1,383 @@
+"""Benchmarks of the pytask task functions and the model helpers.
+
+Every ``task_*`` function of the project is run on synthetic inputs of several sizes
+(see :mod:`src.data_management.synthetic_liss`) in a temporary copy of the
+``original_data`` and ``bld`` folders. Wall time, peak traced memory and the number of
+rows written are recorded per task, named "module::function", and compared with
+``baseline.json``. A run fails if a benchmark got slower or needs more memory than the
+baseline allows, or if it has no baseline. Timings depend on the machine, so the
+baseline is recorded on the machine running the benchmarks::
+
+    python -m src.benchmarks.benchmark_tasks --sizes 1000 10000
+    python -m src.benchmarks.benchmark_tasks --sizes 1000 10000 --update-baseline
+
+Peak memory is measured with :mod:`tracemalloc`, so the wall times include its
+overhead and are only comparable with each other. Tracing is stopped in the worker
+processes of :func:`src.model_code.parallel.map_models`, whose memory is recorded as
+the largest peak resident set size of a worker instead.
+
+"""
+
+import argparse
+import importlib
+import json
+import multiprocessing.util
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from src.config import BLD
+from src.config import ROOT
+from src.config import SRC
+from src.data_management import stata_io
+from src.data_management import wave_store
+from src.data_management.columnar_store import count_rows
+from src.data_management.synthetic_liss import generate_synthetic_liss
+from src.model_code import fit_cache
+from src.model_code import parallel
+
+BASELINE = Path(__file__).parent / "baseline.json"
+# relative slack on the baseline before a benchmark counts as a regression, times
+# below MIN_SECONDS are too noisy to compare
+TOLERANCE = 0.25
+MIN_SECONDS = 0.1
+
+
+def run_benchmarks(sizes, seed=0):
+    """Run all benchmarks for each size.
+
+    Args:
+        sizes (list): Numbers of synthetic respondents.
+        seed (int): Seed of the synthetic data.
+
+    Returns:
+        dict: Measurements by size and benchmark name.
+
+    """
+    # the model code imports these inside its functions, they are imported here so
+    # that the first task or helper fitting a model does not pay for the import
+    for module in ["statsmodels.api", "patsy", "scipy.sparse", "scipy.special"]:
+        importlib.import_module(module)
+    measurements = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            generate_synthetic_liss(root / "original_data" / "liss", size, seed=seed)
+            _write_csv_sources(root / "original_data", n_countries=max(3, size // 1000))
+            tasks = _collect_tasks(root / "original_data" / "liss")
+            with mock.patch.object(
+                stata_io, "CACHE_DIR", root / "bld" / "cache" / "stata"
+            ), mock.patch.object(
+                fit_cache, "CACHE_DIR", root / "bld" / "cache" / "fits"
+            ):
+                measurements[str(size)] = {
+                    **_run_tasks(tasks, root),
+                    **_run_model_helpers(root),
+                }
+    return measurements
+
+
+def compare_with_baseline(measurements, baseline, tolerance=TOLERANCE):
+    """List the benchmarks which are slower, need more memory or have no baseline."""
+    regressions = []
+    for size, benchmarks in measurements.items():
+        for name, measured in benchmarks.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference is None:
+                regressions.append(
+                    f"{name} [{size}]: no baseline, record one with --update-baseline"
+                )
+                continue
+            if (
+                measured["seconds"] > reference["seconds"] * (1 + tolerance)
+                and measured["seconds"] - reference["seconds"] > MIN_SECONDS
+            ):
+                regressions.append(
+                    f"{name} [{size}]: {measured['seconds']:.2f}s, "
+                    f"baseline {reference['seconds']:.2f}s"
+                )
+            for memory, label in [("peak_mb", "peak"), ("workers_peak_mb", "worker")]:
+                if memory not in measured or memory not in reference:
+                    continue
+                if measured[memory] > reference[memory] * (1 + tolerance):
+                    regressions.append(
+                        f"{name} [{size}]: {measured[memory]:.1f}MB {label} peak, "
+                        f"baseline {reference[memory]:.1f}MB"
+                    )
+    return regressions
+
+
+def _measure(func, *args, **kwargs):
+    # forked workers would inherit the tracing, they stop it and report their peak
+    # resident set size to workers_dir when they exit
+    with tempfile.TemporaryDirectory() as workers_dir, mock.patch.object(
+        parallel, "ProcessPoolExecutor", partial(_untraced_pool, Path(workers_dir))
+    ):
+        tracemalloc.start()
+        start = time.perf_counter()
+        output = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        workers_peak = [float(path.read_text()) for path in Path(workers_dir).iterdir()]
+    measured = {"seconds": seconds, "peak_mb": peak / 2**20}
+    if workers_peak:
+        measured["workers_peak_mb"] = max(workers_peak)
+    return output, measured
+
+
+def _untraced_pool(workers_dir, *args, initializer=None, initargs=(), **kwargs):
+    return ProcessPoolExecutor(
+        *args,
+        initializer=_init_worker,
+        initargs=(workers_dir, initializer, initargs),
+        **kwargs,
+    )
+
+
+def _init_worker(workers_dir, initializer, initargs):
+    tracemalloc.stop()
+    # finalizers with an exit priority run when a worker process exits
+    multiprocessing.util.Finalize(
+        None, _record_peak_rss, args=(workers_dir,), exitpriority=0
+    )
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _record_peak_rss(workers_dir):
+    # ru_maxrss is in kB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    (workers_dir / str(os.getpid())).write_text(str(peak_mb))
+
+
+def _collect_tasks(wave_dir):
+    # the wave tasks are parametrized over the waves found when their module is
+    # imported, the modules are reloaded to find the synthetic waves instead
+    discover_waves = partial(wave_store.discover_waves, wave_dir)
+    tasks = []
+    for path in sorted(SRC.rglob("task_*.py")):
+        module_name = ".".join(path.relative_to(ROOT).with_suffix("").parts)
+        with mock.patch.object(wave_store, "discover_waves", discover_waves):
+            module = importlib.reload(importlib.import_module(module_name))
+        for name, func in vars(module).items():
+            # task names repeat across modules, e.g. task_OxCGRT_policy_stringency
+            if name.startswith("task_") and callable(func):
+                tasks.extend(_task_calls(f"{module_name}::{name}", func))
+    return _order_by_dependencies(tasks)
+
+
+def _task_calls(name, func):
+    markers = getattr(func, "pytaskmark", None)
+    if markers is None:
+        markers = func.pytask_meta.markers
+    kwargs = {
+        marker.name: marker.args[0]
+        for marker in markers
+        if marker.name in ["depends_on", "produces"]
+    }
+    parametrize = [marker for marker in markers if marker.name == "parametrize"]
+    if not parametrize:
+        return [(name, func, kwargs)]
+    argnames, argvalues = parametrize[0].args[:2]
+    argnames = [argname.strip() for argname in argnames.split(",")]
+    ids = parametrize[0].kwargs.get("ids") or range(len(argvalues))
+    return [
+        (f"{name}[{id_}]", func, {**kwargs, **dict(zip(argnames, values))})
+        for id_, values in zip(ids, argvalues)
+    ]
+
+
+def _order_by_dependencies(tasks):
+    ordered = []
+    remaining = list(tasks)
+    while remaining:
+        produced_later = {
+            path for _, _, kwargs in remaining for path in _paths(kwargs["produces"])
+        }
+        ready = [
+            task
+            for task in remaining
+            if not produced_later & set(_paths(task[2].get("depends_on", [])))
+        ]
+        if not ready:
+            raise ValueError("The task dependencies contain a cycle.")
+        ordered.extend(ready)
+        remaining = [task for task in remaining if task not in ready]
+    return ordered
+
+
+def _paths(node):
+    if isinstance(node, dict):
+        return [path for value in node.values() for path in _paths(value)]
+    if isinstance(node, (list, tuple)):
+        return [path for value in node for path in _paths(value)]
+    return [node]
+
+
+def _relocate(node, root):
+    # inputs come from the synthetic original_data, outputs go to a scratch bld
+    if isinstance(node, dict):
+        return {key: _relocate(value, root) for key, value in node.items()}
+    if isinstance(node, (list, tuple)):
+        return type(node)(_relocate(value, root) for value in node)
+    for source, target in [
+        (SRC / "original_data", root / "original_data"),
+        (BLD, root / "bld"),
+    ]:
+        if source in Path(node).parents:
+            return target / Path(node).relative_to(source)
+    return node
+
+
+def _run_tasks(tasks, root):
+    measurements = {}
+    for name, func, kwargs in tasks:
+        kwargs = _relocate(kwargs, root)
+        for path in _paths(kwargs["produces"]):
+            path.parent.mkdir(parents=True, exist_ok=True)
+        _, measured = _measure(func, **kwargs)
+        # pickles have no row count, then the total is unknown as well
+        rows = [count_rows(path) for path in _paths(kwargs["produces"])]
+        measured["rows"] = None if None in rows else sum(rows)
+        measurements[name] = measured
+    return measurements
+
+
+def _run_model_helpers(root):
+    from src.model_code.format_result import summary_to_stata_format
+    from src.model_code.regression import binomial_logit_regression_design
+    from src.model_code.regression import binomial_logit_regression_subsets
+    from src.model_code.regression import design_matrices
+    from src.model_code.regression import ordinal_logit_regression_formula
+    from src.model_code.regression import sparse_design_matrices
+    from src.model_code.regression import sparse_logit_regression
+
+    liss = root / "bld" / "data" / "liss"
+    infected = pd.read_parquet(liss / "infected_panel.parquet")
+    compliance = pd.read_parquet(liss / "compliance_panel.parquet").reset_index(
+        level="month", drop=True
+    )
+    infected_formula = (
+        "infected ~ compliance_index + female + living_alone + living_with_children"
+        " + age_cut + edu + occupation + income_hh_group"
+    )
+    compliance_formula = (
+        "compliance_index ~ female + living_alone + living_with_children + age"
+        " + I(age**2) + edu + occupation + net_income_hh_eqv + female*edu"
+    )
+
+    measurements = {}
+    design, measurements["design_matrices"] = _measure(
+        design_matrices, infected, infected_formula
+    )
+    (result, _, _), measurements["binomial_logit_regression_design"] = _measure(
+        binomial_logit_regression_design, design
+    )
+    months = design[1].index.get_level_values("month")
+    masks = [months == month for month in months.unique()]
+    _, measurements["binomial_logit_regression_subsets"] = _measure(
+        binomial_logit_regression_subsets, design, masks
+    )
+    # the same model on a sparse design, with the education x age interactions
+    sparse_design, measurements["sparse_design_matrices"] = _measure(
+        sparse_design_matrices,
+        infected,
+        "infected",
+        numeric=["compliance_index", "female", "living_alone", "living_with_children"],
+        categorical={
+            "age_cut": "age_cut",
+            "edu": "edu",
+            "occupation": "occupation",
+            "income_hh_group": "income_hh_group",
+        },
+        interactions=[("edu", "age_cut")],
+    )
+    _, measurements["sparse_logit_regression"] = _measure(
+        sparse_logit_regression, *sparse_design, groups=infected["hh_id"]
+    )
+    _, measurements["ordinal_logit_regression_formula"] = _measure(
+        ordinal_logit_regression_formula, compliance, compliance_formula
+    )
+    _, measurements["summary_to_stata_format"] = _measure(
+        summary_to_stata_format, result
+    )
+    for name, rows in [
+        ("design_matrices", len(infected)),
+        ("binomial_logit_regression_design", len(design[0])),
+        ("binomial_logit_regression_subsets", len(design[0])),
+        ("sparse_design_matrices", len(infected)),
+        ("sparse_logit_regression", len(sparse_design[0])),
+        ("ordinal_logit_regression_formula", len(compliance)),
+        ("summary_to_stata_format", len(result.params)),
+    ]:
+        measurements[name]["rows"] = rows
+    return measurements
+
+
+def _write_csv_sources(out_dir, n_countries, seed=0):
+    # OWID and OxCGRT files with the columns used by the cleaning tasks
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-01-01", "2021-06-30")
+    countries = ["NLD"] + [f"C{i:02d}" for i in range(1, n_countries)]
+    owid = pd.concat(
+        pd.DataFrame(
+            {
+                "iso_code": country,
+                "location": "Netherlands" if country == "NLD" else country,
+                "date": dates.strftime("%Y-%m-%d"),
+                "total_cases": rng.integers(0, 1000, len(dates)).cumsum(),
+                "total_deaths": rng.integers(0, 10, len(dates)).cumsum(),
+            }
+        )
+        for country in countries
+    )
+    owid.to_csv(out_dir / "owid-covid-data.csv", index=False)
+    oxcgrt = pd.concat(
+        pd.DataFrame(
+            {
+                "CountryName": country,
+                "CountryCode": country,
+                "Jurisdiction": "NAT_TOTAL",
+                "Date": dates.strftime("%Y%m%d"),
+                "C1_School closing": rng.integers(0, 4, len(dates)),
+                "C2_Workplace closing": rng.integers(0, 4, len(dates)),
+                "C6_Stay at home requirements": rng.integers(0, 4, len(dates)),
+            }
+        )
+        for country in countries
+    )
+    oxcgrt.to_csv(out_dir / "OxCGRT_latest.csv", index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000])
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--out", type=Path, default=BLD / "benchmarks" / "benchmark_results.json"
+    )
+    args = parser.parse_args()
+
+    measurements = run_benchmarks(args.sizes)
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    args.out.write_text(json.dumps(measurements, indent=2))
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps({**baseline, **measurements}, indent=2))
+        sys.exit(0)
+    regressions = compare_with_baseline(measurements, baseline, args.tolerance)
+    if regressions:
+        sys.exit("Benchmark regressions:\n" + "\n".join(regressions))
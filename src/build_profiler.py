@@ -0,0 +1,158 @@
+"""Opt-in profiling of the pytask build.
+
+Registered as a pytask plugin, this module records for every executed task its wall
+time, CPU time, peak memory traced by :mod:`tracemalloc` and the sizes and row counts
+of its dependencies and products (only sizes for pickles, the row counts are read from
+file metadata or counted lines and no file is loaded). The total row count of a task
+is missing if one of its files is a pickle. The records are written to
+``BLD / "profile" / "task_profile.json"`` and ``task_profile.csv`` at the end of the
+build. Tasks whose name contains one of the patterns in the environment variable
+``PROFILE_TASKS`` (comma-separated) are also run under :mod:`cProfile`, with the
+statistics dumped to ``BLD / "profile" / "<task>.prof"``.
+
+Run the build through this module to enable the plugin, pytask options are passed
+on::
+
+    python -m src.build_profiler --cprofile task_clean_infected -- -k liss
+
+With pytask 0.4 or later, ``pytask build --hook-module src/build_profiler.py`` does
+the same. Tasks skipped because they are unchanged are not profiled; remove their
+products (or pass ``--force`` with pytask 0.3 or later) to profile the whole build.
+
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytask
+
+from src.config import BLD
+from src.data_management.columnar_store import count_rows
+
+PROFILE_DIR = BLD / "profile"
+
+_RECORDS = []
+
+
+@pytask.hookimpl(hookwrapper=True)
+def pytask_execute_task(session, task):
+    name = getattr(task, "short_name", None) or task.name
+    patterns = [
+        pattern for pattern in os.environ.get("PROFILE_TASKS", "").split(",") if pattern
+    ]
+    profiler = cProfile.Profile() if any(p in name for p in patterns) else None
+
+    tracemalloc.start()
+    start, cpu_start = time.perf_counter(), time.process_time()
+    if profiler is not None:
+        profiler.enable()
+    outcome = yield
+    if profiler is not None:
+        profiler.disable()
+    seconds, cpu_seconds = time.perf_counter() - start, time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if profiler is not None:
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(PROFILE_DIR / f"{_file_name(name)}.prof")
+    _RECORDS.append(
+        {
+            "task": name,
+            "succeeded": outcome.excinfo is None,
+            "seconds": seconds,
+            "cpu_seconds": cpu_seconds,
+            "peak_mb": peak / 2**20,
+            **_file_info("inputs", task.depends_on),
+            **_file_info("outputs", task.produces),
+        }
+    )
+
+
+@pytask.hookimpl
+def pytask_unconfigure(session):
+    if not _RECORDS:
+        return
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    (PROFILE_DIR / "task_profile.json").write_text(json.dumps(_RECORDS, indent=2))
+    pd.DataFrame(_RECORDS).drop(columns=["input_files", "output_files"]).to_csv(
+        PROFILE_DIR / "task_profile.csv", index=False, float_format="%.3f"
+    )
+
+
+def _file_info(kind, nodes):
+    paths = [path for path in _paths(nodes) if path.exists()]
+    files = [
+        {
+            "path": str(path),
+            "mb": path.stat().st_size / 2**20,
+            "rows": count_rows(path),
+        }
+        for path in paths
+    ]
+    rows = [file["rows"] for file in files]
+    return {
+        f"{kind}_mb": sum(file["mb"] for file in files),
+        # pickles have no row count, then the total is unknown as well
+        f"{kind}_rows": None if None in rows else sum(rows),
+        f"{kind[:-1]}_files": files,
+    }
+
+
+def _paths(nodes):
+    # nodes are nested in dicts and lists, file nodes have a path
+    if isinstance(nodes, dict):
+        return [path for node in nodes.values() for path in _paths(node)]
+    if isinstance(nodes, (list, tuple)):
+        return [path for node in nodes for path in _paths(node)]
+    path = getattr(nodes, "path", None)
+    return [Path(path)] if path is not None else []
+
+
+def _file_name(task_name):
+    return "".join(
+        char if char.isalnum() or char in "_-" else "_" for char in task_name
+    )
+
+
+def _run_pytask(pytask_args):
+    # pytask before 0.4 has no option to load a hook module, the plugin is added to
+    # the plugin manager of the build instead
+    import _pytask.build
+
+    get_plugin_manager = _pytask.build.get_plugin_manager
+
+    def get_plugin_manager_with_profiler():
+        pm = get_plugin_manager()
+        pm.register(sys.modules[__name__])
+        return pm
+
+    with mock.patch.object(
+        _pytask.build, "get_plugin_manager", get_plugin_manager_with_profiler
+    ):
+        return pytask.cli.main(args=["build", *pytask_args], standalone_mode=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--cprofile",
+        nargs="+",
+        default=[],
+        help="run tasks whose name contains one of these patterns under cProfile",
+    )
+    parser.add_argument("pytask_args", nargs="*", help="options passed to pytask")
+    args = parser.parse_args()
+
+    if args.cprofile:
+        os.environ["PROFILE_TASKS"] = ",".join(args.cprofile)
+    session = _run_pytask(args.pytask_args)
+    sys.exit(getattr(session, "exit_code", 0))
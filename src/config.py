@@ -3,3 +3,35 @@ from pathlib import Path
 ROOT = Path(__file__).parent.parent
 SRC = Path(__file__).parent
 BLD = ROOT / "bld"
+STATA_CACHE = BLD / "cache" / "stata"
+# upper bound on worker processes for model fitting, 1 fits models serially
+MAX_WORKERS = 4
+# OxCGRT country codes whose policy stringency is built next to the Netherlands
+COMPARISON_COUNTRIES = []
+# household cluster bootstrap of the odds ratio confidence intervals
+BOOTSTRAP_REPLICATES = 1000
+BOOTSTRAP_SEED = 0
+# distribution of the latent error of the ordered compliance models, "logit" or
+# "probit", used by the main table and the specification grid alike
+COMPLIANCE_ORDERED_DISTR = "logit"
+# categorical regressors of the descriptive tables and the prefix of their indicators
+X_VAR_CATEGORIES = {
+    "edu": "edu",
+    "age_cut": "age",
+    "occupation": "occupation",
+    "income_hh_cut": "income_hh",
+}
+# LISS COVID waves are found from the covid_data_YYYY_MM files, these are left out of
+# the infection and the work status data
+INFECTED_EXCLUDED_WAVES = ["2020_02", "2020_03", "2020_06"]
+WORK_STATUS_EXCLUDED_WAVES = ["2020_03", "2020_04"]
+# waves whose work status stands for another month
+WORK_STATUS_MONTHS = {"2020_02": "2020_04"}
+# fitted models are cached by content, the oldest are evicted beyond this size and
+# 0 disables the cache
+FIT_CACHE = BLD / "cache" / "fits"
+FIT_CACHE_MAX_MB = 256
+# household aggregates of the compliance index in the compliance data, by column name:
+# "per_member" divides the household sum by all members, responding or not, "mean",
+# "min", "max" and "count" are taken over the responding members
+COMPLIANCE_HH_AGGREGATES = {"compliance_index_hh": "per_member"}
@@ -0,0 +1,154 @@
+"""Columnar storage for the intermediate data sets under ``BLD / "data" / "liss"``.
+
+The cleaned LISS frames are written as Parquet files. Categorical columns (with their
+categories and ordering) and the ``(personal_id, month)`` index survive the round trip,
+so the analysis tasks can read back only the columns they need instead of unpickling
+whole frames.
+
+Before writing, :func:`compact_dtypes` narrows the dtypes: 0/1 indicators and small
+counts become int8 and the ids the smallest integer type that holds them. The month
+labels are categoricals already, see :func:`src.data_management.wave_store.month_labels`.
+The analysis tasks read the compact dtypes back from the files.
+
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+ID_COLUMNS = ["personal_id", "hh_id"]
+# integer scores with a small range, besides the 0/1 indicators found automatically
+SMALL_INTEGER_COLUMNS = ["compliance_index"]
+
+
+def to_columnar(data, path, compact=True):
+    """Write a cleaned data set to a Parquet file.
+
+    Args:
+        data (pandas.DataFrame or pandas.Series): Data set to store. A Series is stored
+            as a single-column frame named after the Series.
+        path (pathlib.Path): Target file.
+        compact (bool, optional): Apply :func:`compact_dtypes` first.
+
+    """
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    if compact:
+        data = compact_dtypes(data)
+    data.to_parquet(path, engine="pyarrow", index=True)
+
+
+def read_columnar(path, columns=None):
+    """Read a data set written by :func:`to_columnar`.
+
+    Args:
+        path (pathlib.Path): Parquet file.
+        columns (list, optional): Columns to read. The index is always restored.
+            Default None reads all columns.
+
+    Returns:
+        pandas.DataFrame: The stored data set.
+
+    """
+    return pd.read_parquet(path, engine="pyarrow", columns=columns)
+
+
+def count_rows(path, chunksize=2**20):
+    """Number of rows of a data file without reading its data.
+
+    Parquet and Stata files have their metadata read. The lines of CSV files are
+    counted in chunks of bytes, less the header, so quoted line breaks count as rows.
+    The row count of pickles and other files is unknown without loading them and is
+    None.
+
+    """
+    if path.suffix == ".parquet":
+        return pq.ParquetFile(path).metadata.num_rows
+    if path.suffix == ".dta":
+        with pd.read_stata(path, iterator=True) as reader:
+            return reader.nobs
+    if path.suffix == ".csv":
+        lines, last = 0, b"\n"
+        with open(path, "rb") as file:
+            while chunk := file.read(chunksize):
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+        # a last line without a line break is a row, the header is not
+        return max(lines + (last != b"\n") - 1, 0)
+    return None
+
+
+def compact_dtypes(data):
+    """Narrow the dtypes of a cleaned data set.
+
+    Integer columns with only 0 and 1 and the columns in ``SMALL_INTEGER_COLUMNS``
+    become int8 and the ids in ``ID_COLUMNS`` (columns or index levels) the smallest
+    integer type holding them. Other columns are kept, in particular integers like
+    ``age`` which enter formulas in powers that would overflow a narrow type.
+
+    Args:
+        data (pandas.DataFrame): Data set.
+
+    Returns:
+        pandas.DataFrame: The data set with compact dtypes.
+
+    """
+    data = data.copy(deep=False)
+    for column in data.columns:
+        values = data[column]
+        if column in ID_COLUMNS and values.dtype.kind in "iu":
+            data[column] = pd.to_numeric(values, downcast="integer")
+        elif values.dtype.kind == "b" or (
+            values.dtype.kind in "iu"
+            and (column in SMALL_INTEGER_COLUMNS or values.isin([0, 1]).all())
+        ):
+            data[column] = _to_int8(values)
+    # pandas < 2 keeps integer indexes at 64 bit, there the ids in the index stay wide
+    for level, name in enumerate(data.index.names):
+        if name in ID_COLUMNS and isinstance(data.index, pd.MultiIndex):
+            ids = data.index.levels[level]
+            if ids.dtype.kind in "iu" and len(ids):
+                data.index = data.index.set_levels(
+                    pd.to_numeric(ids, downcast="integer"), level=level
+                )
+        elif name in ID_COLUMNS and data.index.dtype.kind in "iu":
+            data.index = pd.Index(
+                pd.to_numeric(data.index, downcast="integer"), name=name
+            )
+    return data
+
+
+def memory_usage(data):
+    """Memory of every column of a data set and of its index.
+
+    Args:
+        data (pandas.DataFrame): Data set.
+
+    Returns:
+        pandas.DataFrame: Dtype and memory in MB, the index is the first row "Index".
+
+    """
+    dtypes = pd.concat(
+        [
+            pd.Series({"Index": "/".join(map(str, _index_dtypes(data.index)))}),
+            data.dtypes,
+        ]
+    ).astype(str)
+    return pd.DataFrame(
+        {
+            "dtype": dtypes,
+            "memory_mb": data.memory_usage(index=True, deep=True) / 2**20,
+        }
+    ).rename_axis("column")
+
+
+def _to_int8(values):
+    if values.min() < np.iinfo(np.int8).min or values.max() > np.iinfo(np.int8).max:
+        raise ValueError(f"{values.name} does not fit into int8.")
+    return values.astype(np.int8)
+
+
+def _index_dtypes(index):
+    if isinstance(index, pd.MultiIndex):
+        return [level.dtype for level in index.levels]
+    return [index.dtype]
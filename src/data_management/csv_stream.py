@@ -0,0 +1,30 @@
+import pandas as pd
+
+
+def read_csv_filtered(path, column, values, usecols, dtype=None, chunksize=100_000):
+    """Stream a large CSV file and keep only the rows matching some values.
+
+    Args:
+        path (pathlib.Path): CSV file.
+        column (str): Column to filter on.
+        values (list): Values of ``column`` to keep.
+        usecols (list): Columns to parse, including ``column``.
+        dtype (dict, optional): Explicit dtypes of the parsed columns.
+        chunksize (int, optional): Number of rows parsed at a time.
+
+    Returns:
+        pandas.DataFrame: The matching rows of ``usecols``. Columns with the dtype
+            "category" are categorical.
+
+    """
+    with pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize) as reader:
+        data = pd.concat(
+            [chunk[chunk[column].isin(values)] for chunk in reader], ignore_index=True
+        )
+    # chunks have different categories and are concatenated as object columns
+    categorical = [
+        name
+        for name, kind in (dtype or {}).items()
+        if kind == "category" and name in data
+    ]
+    return data.astype({name: "category" for name in categorical})
@@ -0,0 +1,64 @@
+"""Scoring of LISS questionnaire scales from a table of item loadings.
+
+A loadings table has one row per item with the columns ``item`` (variable name),
+``scale`` (name of the score) and ``weight`` (e.g. 1 or -1 for reverse-keyed items).
+The answer codes of all items are stacked into one array and every scale is scored
+with a single matrix product.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def read_loadings(path):
+    return pd.read_csv(path, usecols=["item", "scale", "weight"])
+
+
+def score_scales(items, loadings, na_categories=(), missing="propagate"):
+    """Score all scales of a loadings table.
+
+    Args:
+        items (pandas.DataFrame): Categorical answers, one column per item.
+        loadings (pandas.DataFrame): Loadings table, see module docstring.
+        na_categories (tuple, optional): Answer categories such as "I dont know"
+            that count as missing. Codes of the other categories do not change.
+        missing (str, optional): How to score respondents with missing items.
+            "propagate" gives a missing score, "prorate" scales the weighted sum of
+            the answered items up to the full number of items of the scale.
+
+    Returns:
+        pandas.DataFrame: One column per scale, indexed like ``items``.
+
+    """
+    weights = (
+        loadings.pivot(index="item", columns="scale", values="weight")
+        .reindex(index=loadings["item"].unique(), columns=loadings["scale"].unique())
+        .fillna(0)
+    )
+    codes = np.column_stack(
+        [
+            items[item]
+            .cat.remove_categories(
+                [c for c in na_categories if c in items[item].cat.categories]
+            )
+            .cat.codes.to_numpy()
+            for item in weights.index
+        ]
+    )
+    observed = codes >= 0
+    scores = np.where(observed, codes, 0) @ weights.to_numpy()
+
+    in_scale = (weights.to_numpy() != 0).astype(int)
+    n_observed = observed.astype(int) @ in_scale
+    if missing == "propagate":
+        scores = np.where(n_observed == in_scale.sum(axis=0), scores, np.nan)
+    elif missing == "prorate":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(
+                n_observed > 0, scores * in_scale.sum(axis=0) / n_observed, np.nan
+            )
+    else:
+        raise ValueError(f"Unknown missing option {missing!r}.")
+
+    return pd.DataFrame(scores, index=items.index, columns=weights.columns.tolist())
@@ -0,0 +1,78 @@
+"""Column-selective, cached ingestion of the LISS Stata modules.
+
+Only the requested variables are decoded from a ``.dta`` file, and the result is kept
+as a Parquet file keyed on the content hash of the source and the selected columns.
+Rebuilding a task on an unchanged module then skips Stata parsing and the decoding
+of value labels altogether.
+
+"""
+
+import hashlib
+
+import pandas as pd
+
+from src.config import STATA_CACHE
+from src.data_management.columnar_store import read_columnar
+from src.data_management.columnar_store import to_columnar
+
+CACHE_DIR = STATA_CACHE
+
+
+def read_stata_columns(path, columns, chunksize=None, use_cache=True):
+    """Read selected variables of a Stata file, using the columnar cache if possible.
+
+    Args:
+        path (pathlib.Path): Stata file.
+        columns (list): Variables to read.
+        chunksize (int, optional): Read the file in chunks of this many rows. Default
+            None reads it in one go.
+        use_cache (bool, optional): Use the columnar cache in ``CACHE_DIR``.
+
+    Returns:
+        pandas.DataFrame: The selected variables with value labels as categoricals.
+
+    """
+    if use_cache:
+        key = hashlib.sha256(
+            (_file_digest(path) + "|" + ",".join(columns)).encode()
+        ).hexdigest()
+        cache_file = CACHE_DIR / f"{path.stem}-{key[:16]}.parquet"
+        if cache_file.exists():
+            return read_columnar(cache_file)
+
+    if chunksize is None:
+        data = pd.read_stata(path, columns=columns)
+    else:
+        # chunks only see part of the values, so value labels are applied once at
+        # the end to get the same categories as a single read
+        with pd.read_stata(
+            path, columns=columns, chunksize=chunksize, convert_categoricals=False
+        ) as reader:
+            value_labels = reader.value_labels()
+            label_names = dict(zip(reader.varlist, reader.lbllist))
+            data = pd.concat(reader, ignore_index=True)
+        data = _apply_value_labels(data, value_labels, label_names)
+
+    if use_cache:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        to_columnar(data, cache_file, compact=False)
+    return data
+
+
+def _apply_value_labels(data, value_labels, label_names):
+    for column in data.columns:
+        labels = value_labels.get(label_names.get(column))
+        if labels:
+            codes = pd.Categorical(data[column], ordered=True)
+            data[column] = codes.rename_categories(
+                [labels.get(value, value) for value in codes.categories]
+            )
+    return data
+
+
+def _file_digest(path, block_size=2**20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,235 @@
+"""Synthetic LISS panel with the schema of the files in ``original_data/liss``.
+
+The generator writes the COVID waves ``covid_data_YYYY_MM.pickle``, the background
+data ``background_data_merged.pickle`` and the Stata modules used by the cleaning
+tasks. Variable names, categories and the ``(personal_id, month)`` index follow the
+LISS files, the values are random. It is meant for load tests of the pipeline at
+respondent counts far above the real panel, e.g. ::
+
+    python -m src.data_management.synthetic_liss --respondents 500000 --out <dir>
+
+with ``<dir>`` the ``original_data/liss`` folder of a scratch copy of the project.
+
+"""
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import BLD
+
+WAVES = ["2020_02", "2020_03", "2020_04", "2020_05", "2020_06", "2020_09", "2020_12"]
+# share of households with 1, 2, ... members
+HOUSEHOLD_SIZES = {1: 0.35, 2: 0.33, 3: 0.13, 4: 0.13, 5: 0.06}
+
+INFECTION_DIAGNOSED = ["yes, I have been diagnosed with it", "no", "unsure"]
+INFECTION_PERCEIVED = ["no", "unsure", "yes"]
+WORK_STATUS = [
+    "homemaker",
+    "social assistance",
+    "employed",
+    "retired",
+    "student or trainee",
+    "unemployed",
+    "self-employed",
+]
+COMPLIANCE = [
+    "avoid_busy_places",
+    "avoid_public_places",
+    "maintain_distance",
+    "adjust_school_work",
+    "quarantine_symptoms",
+    "quarantine_no_symptoms",
+    "no_avoidance_behaviors",
+]
+COMPLY_CURFEW_SELF = ["yes", "no", "critical profession"]
+TRUST_GOV = [str(i) for i in range(11)]
+EDU = ["lower_secondary_and_lower", "upper_secondary", "tertiary"]
+EDU_4 = ["primary", "lower_secondary", "upper_secondary", "tertiary"]
+INCOME_HH_GROUP = ["< 1150", "1150 - 1800", "1800 - 2600", "2600 - 3600", "> 3600"]
+INDUSTRY = [
+    "agriculture, forestry, fishery, hunting",
+    "mining",
+    "industrial production",
+    "utilities production, distribution and/or trade",
+    "construction",
+    "retail trade",
+    "catering",
+    "transport, storage and communication",
+    "financial",
+    "business services",
+    "government services, public administration and mandatory social insurances",
+    "education",
+    "healthcare and welfare",
+    "environmental services, culture, recreation and other services",
+    "other",
+]
+BIG_FIVE = [
+    "very inaccurate",
+    "moderately inaccurate",
+    "neither inaccurate nor accurate",
+    "moderately accurate",
+    "very accurate",
+]
+IDEOLOGY = ["0 left"] + [str(i) for i in range(1, 10)] + ["10 right", "I dont know"]
+TRUST = [str(i) for i in range(1, 11)] + ["don't know / no opinion"]
+
+
+def generate_synthetic_liss(
+    out_dir,
+    n_respondents,
+    waves=WAVES,
+    household_sizes=HOUSEHOLD_SIZES,
+    response_rate=0.85,
+    seed=0,
+):
+    """Write a synthetic LISS panel.
+
+    Args:
+        out_dir (pathlib.Path): Target directory, created if needed.
+        n_respondents (int): Number of panel members.
+        waves (list): COVID waves as "YYYY_MM".
+        household_sizes (dict): Share of households by number of members.
+        response_rate (float): Probability that a member answers a wave or module.
+        seed (int): Seed of the random number generator.
+
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    background = _background(rng, n_respondents, household_sizes)
+    background.to_pickle(out_dir / "background_data_merged.pickle")
+    personal_id = background.index.to_numpy()
+
+    for wave in waves:
+        answered = personal_id[rng.random(n_respondents) < response_rate]
+        _covid_wave(rng, wave, answered).to_pickle(
+            out_dir / f"covid_data_{wave}.pickle"
+        )
+
+    modules = {
+        "cw19l_EN_3.0p.dta": {
+            "cw19l_m": lambda n: np.full(n, 201911.0),
+            "cw19l402": lambda n: _categorical(rng, INDUSTRY, n),
+        },
+        "cp21m_EN_1.0p.dta": {
+            f"cp21m0{i}": lambda n: _categorical(rng, BIG_FIVE, n)
+            for i in range(20, 70)
+        },
+        "cv21m_EN_1.0p.dta": {"cv21m101": lambda n: _categorical(rng, IDEOLOGY, n)},
+        "mb15a_EN_1.1p.dta": {
+            "mb15a011": lambda n: _categorical(rng, TRUST, n),
+            "mb15a013": lambda n: _categorical(rng, TRUST, n),
+        },
+    }
+    for file_name, variables in modules.items():
+        answered = personal_id[rng.random(n_respondents) < response_rate]
+        module = pd.DataFrame({"nomem_encr": answered.astype(float)})
+        for name, draw in variables.items():
+            module[name] = draw(len(answered))
+        module.to_stata(out_dir / file_name, write_index=False, version=117)
+
+
+def _background(rng, n_respondents, household_sizes):
+    sizes = np.array(list(household_sizes))
+    shares = np.array(list(household_sizes.values())) / sum(household_sizes.values())
+    # draw households until there are enough members, the last one may be cut
+    n_households = int(n_respondents / (sizes @ shares)) + len(sizes)
+    hh_members = rng.choice(sizes, n_households, p=shares)
+    while hh_members.sum() < n_respondents:
+        hh_members = np.append(hh_members, rng.choice(sizes, n_households, p=shares))
+    hh_id = np.repeat(np.arange(len(hh_members)), hh_members)[:n_respondents]
+    hh_members = np.repeat(hh_members, hh_members)[:n_respondents]
+
+    net_income_hh = rng.lognormal(8, 0.5, n_respondents)
+    net_income_hh_eqv = net_income_hh / np.sqrt(hh_members)
+    income_group = np.digitize(net_income_hh, [1150, 1800, 2600, 3600])
+    return pd.DataFrame(
+        {
+            "hh_id": 500000.0 + hh_id,
+            "age": rng.integers(16, 95, n_respondents).astype(float),
+            "female": rng.integers(0, 2, n_respondents).astype(float),
+            "edu": _categorical(rng, EDU, n_respondents),
+            "edu_4": _categorical(rng, EDU_4, n_respondents),
+            "net_income": rng.lognormal(7.5, 0.7, n_respondents),
+            "hh_members": hh_members.astype(float),
+            "hh_children": rng.integers(0, np.maximum(hh_members - 1, 0) + 1)
+            .clip(max=3)
+            .astype(float),
+            "net_income_hh_eqv": net_income_hh_eqv,
+            "income_hh_group": pd.Categorical.from_codes(income_group, INCOME_HH_GROUP),
+            "net_income_hh": net_income_hh,
+            "gross_income_hh": net_income_hh * rng.uniform(1.2, 1.6, n_respondents),
+        },
+        index=pd.Index(800000 + np.arange(n_respondents), name="personal_id"),
+    )
+
+
+def _covid_wave(rng, wave, personal_id):
+    n = len(personal_id)
+    month = pd.Timestamp(wave.replace("_", "-") + "-01")
+    wave_data = pd.DataFrame(
+        index=pd.MultiIndex.from_arrays(
+            [personal_id, pd.DatetimeIndex(np.repeat(month, n))],
+            names=["personal_id", "month"],
+        )
+    )
+    # the variables asked depend on the wave as in the LISS COVID questionnaires
+    if wave not in ["2020_03", "2020_04"]:
+        wave_data["work_status"] = _categorical(
+            rng, WORK_STATUS, n, p=[0.08, 0.03, 0.45, 0.25, 0.08, 0.04, 0.07]
+        )
+    if wave >= "2020_04":
+        wave_data["infection_diagnosed"] = _categorical(
+            rng, INFECTION_DIAGNOSED, n, p=[0.03, 0.9, 0.07], missing=0.02
+        )
+    if "2020_04" <= wave <= "2020_05":
+        wave_data["infection_perceived"] = _categorical(
+            rng, INFECTION_PERCEIVED, n, p=[0.8, 0.15, 0.05]
+        )
+    if wave == "2020_03":
+        for variable in COMPLIANCE:
+            wave_data[variable] = (rng.random(n) < 0.5).astype(float)
+        wave_data["comply_curfew_self"] = _categorical(rng, COMPLY_CURFEW_SELF, n)
+        wave_data["trust_gov"] = _categorical(rng, TRUST_GOV, n)
+    if wave == "2020_04":
+        wave_data["essential_worker"] = (rng.random(n) < 0.3).astype(float)
+    return wave_data
+
+
+def _categorical(rng, categories, n, p=None, missing=0.0):
+    codes = rng.choice(len(categories), n, p=p)
+    codes[rng.random(n) < missing] = -1
+    return pd.Categorical.from_codes(codes, categories)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--respondents", type=int, default=10_000)
+    parser.add_argument("--waves", nargs="+", default=WAVES)
+    parser.add_argument(
+        "--household-sizes",
+        nargs="+",
+        type=float,
+        help="share of households with 1, 2, ... members",
+    )
+    parser.add_argument("--response-rate", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, default=BLD / "synthetic" / "liss")
+    args = parser.parse_args()
+
+    generate_synthetic_liss(
+        args.out,
+        args.respondents,
+        waves=args.waves,
+        household_sizes=(
+            HOUSEHOLD_SIZES
+            if args.household_sizes is None
+            else dict(enumerate(args.household_sizes, start=1))
+        ),
+        response_rate=args.response_rate,
+        seed=args.seed,
+    )
@@ -3,14 +3,25 @@ import pytask
 
 from src.config import BLD
 from src.config import SRC
+from src.data_management.csv_stream import read_csv_filtered
 
 
 @pytask.mark.depends_on(SRC / "original_data" / "owid-covid-data.csv")
 @pytask.mark.produces(BLD / "data" / "covid_SIRD.pickle")
 def task_OxCGRT_policy_stringency(depends_on, produces):
-    owid = pd.read_csv(depends_on)
-    owid = owid.query("location == 'Netherlands'")
-    owid = owid.set_index(pd.to_datetime(owid["date"]))
+    owid = read_csv_filtered(
+        depends_on,
+        "location",
+        ["Netherlands"],
+        usecols=["location", "date", "total_cases", "total_deaths"],
+        dtype={
+            "location": str,
+            "date": str,
+            "total_cases": "float64",
+            "total_deaths": "float64",
+        },
+    )
+    owid = owid.set_index(pd.to_datetime(owid["date"], format="%Y-%m-%d"))
     covid_SIRD = (
         owid[["total_cases", "total_deaths"]]
         .groupby(pd.Grouper(freq="M"))
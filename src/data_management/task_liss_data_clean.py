@@ -3,13 +3,29 @@ import pandas as pd
 import pytask
 
 from src.config import BLD
+from src.config import COMPLIANCE_HH_AGGREGATES
+from src.config import INFECTED_EXCLUDED_WAVES
 from src.config import SRC
+from src.config import WORK_STATUS_EXCLUDED_WAVES
+from src.config import WORK_STATUS_MONTHS
+from src.data_management.columnar_store import read_columnar
+from src.data_management.columnar_store import to_columnar
+from src.data_management.scale_scoring import read_loadings
+from src.data_management.scale_scoring import score_scales
+from src.data_management.stata_io import read_stata_columns
+from src.data_management.wave_store import discover_waves
+from src.data_management.wave_store import month_labels
+from src.data_management.wave_store import partition_path
+from src.data_management.wave_store import read_partitions
+
+INFECTED_WAVES = discover_waves(exclude=INFECTED_EXCLUDED_WAVES)
+WORK_STATUS_WAVES = discover_waves(exclude=WORK_STATUS_EXCLUDED_WAVES)
 
 
 @pytask.mark.depends_on(
     SRC / "original_data" / "liss" / "background_data_merged.pickle"
 )
-@pytask.mark.produces(BLD / "data" / "liss" / "background.pickle")
+@pytask.mark.produces(BLD / "data" / "liss" / "background.parquet")
 def task_clean_background_data(depends_on, produces):
     background = pd.read_pickle(depends_on)
     select_background = background[
@@ -85,55 +101,70 @@ def task_clean_background_data(depends_on, produces):
 
     select_background.rename(columns={})
 
-    select_background.to_pickle(produces)
+    to_columnar(select_background, produces)
 
 
-@pytask.mark.depends_on(
-    {
-        month: SRC / "original_data" / "liss" / f"covid_data_{month}.pickle"
-        for month in ["2020_04", "2020_05", "2020_09", "2020_12"]
-    }
+@pytask.mark.parametrize(
+    "depends_on, produces",
+    [(path, partition_path("infected", wave)) for wave, path in INFECTED_WAVES.items()],
+    ids=list(INFECTED_WAVES),
 )
-@pytask.mark.produces(BLD / "data" / "liss" / "infected.pickle")
-def task_clean_infected_data(depends_on, produces):
-    covid_data_list = [pd.read_pickle(wave) for wave in depends_on.values()]
-    covid_data = pd.concat(covid_data_list)
-    select_covid = covid_data[["infection_diagnosed", "infection_perceived"]].dropna(
-        axis=0, how="all"
-    )
-    select_covid["infection_diagnosed"] = (
+def task_clean_infected_wave(depends_on, produces):
+    covid_data = pd.read_pickle(depends_on)
+    select_covid = covid_data.reindex(
+        columns=["infection_diagnosed", "infection_perceived"]
+    ).dropna(axis=0, how="all")
+    select_covid["infection_diagnosed"] = pd.Categorical(
         select_covid["infection_diagnosed"]
-        .cat.rename_categories({"yes, I have been diagnosed with it": "yes"})
-        .cat.reorder_categories(["no", "unsure", "yes"], ordered=True)
+        .astype(object)
+        .replace({"yes, I have been diagnosed with it": "yes"}),
+        categories=["no", "unsure", "yes"],
+        ordered=True,
     )
     # 1: infection diagnosed, 0: not infected diagnosed or unsure
     select_covid["infected"] = select_covid["infection_diagnosed"].eq("yes").astype(int)
+    to_columnar(select_covid, produces)
+
 
-    select_covid["Month"] = select_covid.index.get_level_values("month").month_name()
-
-    infected_wide = select_covid["infection_diagnosed"].cat.codes.unstack()
-    for i in range(infected_wide.shape[0]):
-        for j in range(infected_wide.shape[1] - 1, 0, -1):
-            if infected_wide.iloc[i, j] <= infected_wide.iloc[i, j - 1]:
-                infected_wide.iloc[i, j] = 0
-    new_infected = (
-        infected_wide.stack()
-        .rename("new_infected")
-        .astype("category")
-        .cat.rename_categories(["no", "unsure", "yes"])
-        .cat.reorder_categories(["no", "unsure", "yes"], ordered=True)
+@pytask.mark.depends_on(
+    {wave: partition_path("infected", wave) for wave in INFECTED_WAVES}
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "infected.parquet")
+def task_clean_infected_data(depends_on, produces):
+    select_covid = read_partitions(depends_on.values())
+
+    # wide array of diagnosis codes (respondent x wave), -1 marks a missing wave
+    infected_wide = select_covid["infection_diagnosed"].cat.codes.unstack(fill_value=-1)
+    codes = infected_wide.to_numpy()
+    new_codes = codes.copy()
+    # a diagnosis is only new if its code increased since the previous wave; waves
+    # with a missing current or previous answer are not compared
+    not_increased = (
+        (codes[:, 1:] <= codes[:, :-1]) & (codes[:, 1:] >= 0) & (codes[:, :-1] >= 0)
+    )
+    new_codes[:, 1:][not_increased] = 0
+    new_infected = pd.Series(
+        pd.Categorical.from_codes(
+            new_codes.ravel(),
+            categories=select_covid["infection_diagnosed"].cat.categories,
+            ordered=True,
+        ),
+        index=pd.MultiIndex.from_product([infected_wide.index, infected_wide.columns]),
+        name="new_infected",
     )
     select_covid = select_covid.join(new_infected)
-    select_covid.to_pickle(produces)
+    # labels of the months of all waves, see month_labels
+    select_covid["Month"] = month_labels(select_covid.index.get_level_values("month"))
+    to_columnar(select_covid, produces)
 
 
 @pytask.mark.depends_on(
     {
         "covid_data": SRC / "original_data" / "liss" / "covid_data_2020_03.pickle",
-        "background": BLD / "data" / "liss" / "background.pickle",
+        "background": BLD / "data" / "liss" / "background.parquet",
     }
 )
-@pytask.mark.produces(BLD / "data" / "liss" / "compliance.pickle")
+@pytask.mark.produces(BLD / "data" / "liss" / "compliance.parquet")
 def task_clean_compliance_data(depends_on, produces):
     covid_data = pd.read_pickle(depends_on["covid_data"])
     compliance = covid_data[
@@ -183,10 +214,10 @@ def task_clean_compliance_data(depends_on, produces):
         .astype(int)
     )
 
-    compliance["Month"] = compliance.index.get_level_values("month").month_name()
+    compliance["Month"] = month_labels(compliance.index.get_level_values("month"))
 
     # merge background['hh_id']
-    background = pd.read_pickle(depends_on["background"])
+    background = read_columnar(depends_on["background"], ["hh_id", "hh_members"])
     merge_data = pd.merge(
         compliance.reset_index("month"),
         background[["hh_id", "hh_members"]],
@@ -194,46 +225,38 @@ def task_clean_compliance_data(depends_on, produces):
         how="inner",
     )
 
-    # compliance_index_hh = sum of compliance_index in same household/ hh_members
-    compliance_index_hh = (
-        merge_data.groupby("hh_id")
-        .sum()["compliance_index"]
-        .rename("compliance_index_hh")
-    )
-    merge_data = merge_data.join(compliance_index_hh, on="hh_id", how="inner")
-    merge_data["compliance_index_hh"] = (
-        merge_data["compliance_index_hh"] / merge_data["hh_members"]
+    # household aggregates, e.g. compliance_index_hh = sum of compliance_index in same
+    # household / hh_members
+    merge_data = merge_data.assign(
+        **_household_aggregates(
+            merge_data["compliance_index"],
+            merge_data["hh_id"],
+            merge_data["hh_members"],
+            COMPLIANCE_HH_AGGREGATES,
+        )
     )
 
-    # # compliance_index_hh = min of compliance_index in same household
-    # compliance_index_hh = (
-    #     merge_data.groupby("hh_id")
-    #     .min()["compliance_index"]
-    #     .rename("compliance_index_hh")
-    # )
-    # merge_data = merge_data.join(compliance_index_hh, on="hh_id", how="inner")
-
     merge_data.set_index("month", append=True, inplace=True)
     merge_data.drop(columns=["hh_id", "hh_members"], inplace=True)
-    merge_data.to_pickle(produces)
+    to_columnar(merge_data, produces)
 
 
-@pytask.mark.depends_on(
-    {
-        month: SRC / "original_data" / "liss" / f"covid_data_{month}.pickle"
-        for month in ["2020_02", "2020_05", "2020_06", "2020_09", "2020_12"]
-    }
+@pytask.mark.parametrize(
+    "depends_on, produces, wave",
+    [
+        (path, partition_path("work_status", wave), wave)
+        for wave, path in WORK_STATUS_WAVES.items()
+    ],
+    ids=list(WORK_STATUS_WAVES),
 )
-@pytask.mark.produces(BLD / "data" / "liss" / "work_status.pickle")
-def task_clean_work_status_data(depends_on, produces):
-    covid_data_list = [pd.read_pickle(wave) for wave in depends_on.values()]
-    covid_data = pd.concat(covid_data_list).reset_index("month")
-    month = covid_data["month"].replace(
-        pd.Timestamp(year=2020, month=2, day=1), pd.Timestamp(year=2020, month=4, day=1)
-    )
-    covid_data["month"] = month
-    select_covid = covid_data.set_index(["month"], append=True)[["work_status"]].dropna(
-        axis=0, how="any"
+def task_clean_work_status_wave(depends_on, produces, wave):
+    covid_data = pd.read_pickle(depends_on).reset_index("month")
+    if wave in WORK_STATUS_MONTHS:
+        covid_data["month"] = pd.Timestamp(WORK_STATUS_MONTHS[wave].replace("_", "-"))
+    select_covid = (
+        covid_data.set_index(["month"], append=True)
+        .reindex(columns=["work_status"])
+        .dropna(axis=0, how="any")
     )
 
     select_covid.loc[:, "occupation"] = pd.Categorical(
@@ -247,12 +270,21 @@ def task_clean_work_status_data(depends_on, produces):
                 "unemployed": "unemployed",
                 "employed": "employed",
             }
-        )
-    ).reorder_categories(["unemployed", "employed"])
+        ),
+        categories=["unemployed", "employed"],
+    )
     select_covid["employed"] = select_covid["occupation"].eq("employed").astype(int)
-    select_covid["Month"] = select_covid.index.get_level_values("month").month_name()
+    to_columnar(select_covid, produces)
 
-    select_covid.to_pickle(produces)
+
+@pytask.mark.depends_on(
+    {wave: partition_path("work_status", wave) for wave in WORK_STATUS_WAVES}
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "work_status.parquet")
+def task_clean_work_status_data(depends_on, produces):
+    work_status = read_partitions(depends_on.values())
+    work_status["Month"] = month_labels(work_status.index.get_level_values("month"))
+    to_columnar(work_status, produces)
 
 
 @pytask.mark.depends_on(
@@ -261,7 +293,7 @@ def task_clean_work_status_data(depends_on, produces):
         "covid04": SRC / "original_data" / "liss" / "covid_data_2020_04.pickle",
     }
 )
-@pytask.mark.produces(BLD / "data" / "liss" / "essential_worker.pickle")
+@pytask.mark.produces(BLD / "data" / "liss" / "essential_worker.parquet")
 def task_clean_essential_worker_data(depends_on, produces):
     cruciaal = (
         pd.read_pickle(depends_on["covid04"])
@@ -284,13 +316,15 @@ def task_clean_essential_worker_data(depends_on, produces):
         on="personal_id",
         how="outer",
     )
-    essential_worker.to_pickle(produces)
+    to_columnar(essential_worker, produces)
 
 
 @pytask.mark.depends_on(SRC / "original_data" / "liss" / "cw19l_EN_3.0p.dta")
-@pytask.mark.produces(BLD / "data" / "liss" / "industry.pickle")
+@pytask.mark.produces(BLD / "data" / "liss" / "industry.parquet")
 def task_clean_industry_data(depends_on, produces):
-    work_schooling = pd.read_stata(depends_on)
+    work_schooling = read_stata_columns(
+        depends_on, ["nomem_encr", "cw19l_m", "cw19l402"]
+    )
     industry_data = work_schooling[["nomem_encr", "cw19l_m", "cw19l402"]]
     industry_data.insert(
         0,
@@ -304,202 +338,94 @@ def task_clean_industry_data(depends_on, produces):
         .dropna()
     )
 
-    industry_data.to_pickle(produces)
+    to_columnar(industry_data, produces)
 
 
-@pytask.mark.depends_on(SRC / "original_data" / "liss" / "cp21m_EN_1.0p.dta")
-@pytask.mark.produces(BLD / "data" / "liss" / "personality.pickle")
+@pytask.mark.depends_on(
+    {
+        "data": SRC / "original_data" / "liss" / "cp21m_EN_1.0p.dta",
+        "loadings": SRC / "data_management" / "scales" / "big_five.csv",
+    }
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "personality.parquet")
 def task_clean_personality_data(depends_on, produces):
-    ori_data = pd.read_stata(depends_on)
+    loadings = read_loadings(depends_on["loadings"])
+    ori_data = read_stata_columns(
+        depends_on["data"], ["nomem_encr"] + loadings["item"].tolist()
+    )
     ori_data.insert(0, "personal_id", ori_data["nomem_encr"].astype(int))
     ori_data.set_index(["personal_id"], inplace=True)
 
-    big_5 = ori_data[["cp21m0" + str(i) for i in range(20, 70)]].rename(
-        columns={
-            "cp21m020": "am the life of the party",
-            "cp21m021": "feel little concern for others",
-            "cp21m022": "am always prepared",
-            "cp21m023": "get stressed out easily",
-            "cp21m024": "have a rich vocabulary",
-            "cp21m025": "don't talk a lot",
-            "cp21m026": "am interested in people",
-            "cp21m027": "leave my belongings around",
-            "cp21m028": "am relaxed most of the time",
-            "cp21m029": "have difficulty understanding abstract ideas",
-            "cp21m030": "feel comfortable around people",
-            "cp21m031": "insult people",
-            "cp21m032": "pay attention to details",
-            "cp21m033": "worry about things",
-            "cp21m034": "have a vivid imagination",
-            "cp21m035": "keep in the background",
-            "cp21m036": "sympathize with others' feelings",
-            "cp21m037": "make a mess of things",
-            "cp21m038": "seldom feel blue",
-            "cp21m039": "am not interested in abstract ideas",
-            "cp21m040": "start conversations",
-            "cp21m041": "am not interested in other people's problems",
-            "cp21m042": "get chores done right away",
-            "cp21m043": "am easily disturbed",
-            "cp21m044": "have excellent ideas",
-            "cp21m045": "have little to say",
-            "cp21m046": "have a soft heart",
-            "cp21m047": "often forget to put things back in their proper place",
-            "cp21m048": "get upset easily",
-            "cp21m049": "do not have a good imagination",
-            "cp21m050": "talk to a lot of different people at parties",
-            "cp21m051": "am not really interested in others",
-            "cp21m052": "like order",
-            "cp21m053": "change my mood a lot",
-            "cp21m054": "am quick to understand things",
-            "cp21m055": "don't like to draw attention to myself",
-            "cp21m056": "take time out for others",
-            "cp21m057": "shirk my duties",
-            "cp21m058": "have frequent mood swings",
-            "cp21m059": "use difficult words",
-            "cp21m060": "don't mind being the center of attention",
-            "cp21m061": "feel others' emotions",
-            "cp21m062": "follow a schedule",
-            "cp21m063": "get irritated easily",
-            "cp21m064": "spend time reflecting on things",
-            "cp21m065": "am quiet around strangers",
-            "cp21m066": "make people feel at ease",
-            "cp21m067": "am exacting in my work",
-            "cp21m068": "often feel blue",
-            "cp21m069": "am full of ideas",
-        }
-    )
+    # big five traits: sum of the answer codes, reverse-keyed items are subtracted
+    personality = score_scales(ori_data, loadings)
+    to_columnar(personality, produces)
 
-    extraversion = (
-        big_5["am the life of the party"].cat.codes
-        + big_5["feel comfortable around people"].cat.codes
-        + big_5["start conversations"].cat.codes
-        + big_5["talk to a lot of different people at parties"].cat.codes
-        + big_5["don't mind being the center of attention"].cat.codes
-        - big_5["don't talk a lot"].cat.codes
-        - big_5["keep in the background"].cat.codes
-        - big_5["have little to say"].cat.codes
-        - big_5["don't like to draw attention to myself"].cat.codes
-        - big_5["am quiet around strangers"].cat.codes
-    )
-    openness = (
-        big_5["have a rich vocabulary"].cat.codes
-        + big_5["have a vivid imagination"].cat.codes
-        + big_5["have excellent ideas"].cat.codes
-        + big_5["am quick to understand things"].cat.codes
-        + big_5["use difficult words"].cat.codes
-        + big_5["spend time reflecting on things"].cat.codes
-        + big_5["am full of ideas"].cat.codes
-        - big_5["have difficulty understanding abstract ideas"].cat.codes
-        - big_5["am not interested in abstract ideas"].cat.codes
-        - big_5["do not have a good imagination"].cat.codes
-    )
-    conscientiousness = (
-        big_5["am always prepared"].cat.codes
-        + big_5["pay attention to details"].cat.codes
-        + big_5["get chores done right away"].cat.codes
-        + big_5["like order"].cat.codes
-        + big_5["follow a schedule"].cat.codes
-        + big_5["am exacting in my work"].cat.codes
-        - big_5["leave my belongings around"].cat.codes
-        - big_5["make a mess of things"].cat.codes
-        - big_5["often forget to put things back in their proper place"].cat.codes
-        - big_5["shirk my duties"].cat.codes
-    )
-    agreeableness = (
-        big_5["am interested in people"].cat.codes
-        + big_5["sympathize with others' feelings"].cat.codes
-        + big_5["have a soft heart"].cat.codes
-        + big_5["take time out for others"].cat.codes
-        + big_5["feel others' emotions"].cat.codes
-        + big_5["make people feel at ease"].cat.codes
-        - big_5["am not really interested in others"].cat.codes
-        - big_5["insult people"].cat.codes
-        - big_5["am not interested in other people's problems"].cat.codes
-        - big_5["feel little concern for others"].cat.codes
-    )
-    neuroticism = (
-        -big_5["am relaxed most of the time"].cat.codes
-        - big_5["seldom feel blue"].cat.codes
-        + big_5["get stressed out easily"].cat.codes
-        + big_5["worry about things"].cat.codes
-        + big_5["am easily disturbed"].cat.codes
-        + big_5["get upset easily"].cat.codes
-        + big_5["change my mood a lot"].cat.codes
-        + big_5["have frequent mood swings"].cat.codes
-        + big_5["get irritated easily"].cat.codes
-        + big_5["often feel blue"].cat.codes
-    )
-
-    personality = pd.DataFrame(
-        {
-            "extraversion": extraversion,
-            "openness": openness,
-            "conscientiousness": conscientiousness,
-            "agreeableness": agreeableness,
-            "neuroticism": neuroticism,
-        }
-    )
-    personality.to_pickle(produces)
 
-
-@pytask.mark.depends_on(SRC / "original_data" / "liss" / "cv21m_EN_1.0p.dta")
-@pytask.mark.produces(BLD / "data" / "liss" / "politics.pickle")
+@pytask.mark.depends_on(
+    {
+        "data": SRC / "original_data" / "liss" / "cv21m_EN_1.0p.dta",
+        "loadings": SRC / "data_management" / "scales" / "ideology.csv",
+    }
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "politics.parquet")
 def task_clean_politics_data(depends_on, produces):
-    ori_data = pd.read_stata(depends_on)
+    loadings = read_loadings(depends_on["loadings"])
+    ori_data = read_stata_columns(
+        depends_on["data"], ["nomem_encr"] + loadings["item"].tolist()
+    )
     ori_data.insert(0, "personal_id", ori_data["nomem_encr"].astype(int))
     ori_data.set_index(["personal_id"], inplace=True)
 
     # 0 ("Left") to 10 ("Right").
-    ideology = (
-        ori_data["cv21m101"]
-        .rename("ideology")
-        .replace("I dont know", np.nan)
-        .cat.remove_unused_categories()
-        .cat.codes
-    )
-
-    politics = pd.DataFrame({"ideology": ideology})
-    politics.to_pickle(produces)
+    politics = score_scales(ori_data, loadings, na_categories=["I dont know"])
+    to_columnar(politics, produces)
 
 
 @pytask.mark.depends_on(
     {
         "god": SRC / "original_data" / "liss" / "mb15a_EN_1.1p.dta",
+        "loadings": SRC / "data_management" / "scales" / "trust.csv",
         "covid03": SRC / "original_data" / "liss" / "covid_data_2020_03.pickle",
     }
 )
-@pytask.mark.produces(BLD / "data" / "liss" / "trust.pickle")
+@pytask.mark.produces(BLD / "data" / "liss" / "trust.parquet")
 def task_trust_data(depends_on, produces):
-    god_data = pd.read_stata(depends_on["god"])
+    loadings = read_loadings(depends_on["loadings"])
+    god_data = read_stata_columns(
+        depends_on["god"], ["nomem_encr"] + loadings["item"].tolist()
+    )
     god_data.insert(0, "personal_id", god_data["nomem_encr"].astype(int))
     god_data.set_index(["personal_id"], inplace=True)
     covid03_data = pd.read_pickle(depends_on["covid03"]).reset_index("month")
 
     # 1 = no trust at all 10 = complete trust
-    trust_institutions = (
-        god_data[["mb15a011", "mb15a013"]]
-        .rename(
-            columns={"mb15a011": "trust_science", "mb15a013": "trust_political_parties"}
-        )
-        .replace("don't know / no opinion", np.nan)
-    )
-    trust_institutions["trust_science"] = (
-        trust_institutions["trust_science"].cat.remove_unused_categories().cat.codes / 2
-    )
-    trust_institutions["trust_political_parties"] = (
-        trust_institutions["trust_political_parties"]
-        .cat.remove_unused_categories()
-        .cat.codes
-        / 2
+    trust_institutions = score_scales(
+        god_data, loadings, na_categories=["don't know / no opinion"]
     )
 
-    trust_gov = (
-        covid03_data["trust_gov"]
-        .cat.remove_unused_categories()
-        .cat.codes.rename("trust_gov")
+    trust_gov = score_scales(
+        covid03_data[["trust_gov"]],
+        pd.DataFrame({"item": ["trust_gov"], "scale": ["trust_gov"], "weight": [1]}),
     )
 
     trust = pd.merge(
         trust_institutions, trust_gov, on="personal_id", how="outer"
     ).dropna(how="all")
-    trust.to_pickle(produces)
+    to_columnar(trust, produces)
+
+
+def _household_aggregates(values, hh_id, hh_members, aggregates):
+    # all statistics come from one grouped aggregation on the household codes and
+    # are broadcast back to the members by indexing, without a join
+    codes, _ = pd.factorize(hh_id)
+    statistics = {stat for stat in aggregates.values() if stat != "per_member"}
+    if "per_member" in aggregates.values():
+        statistics.add("sum")
+    by_household = values.groupby(codes).agg(sorted(statistics))
+    columns = {}
+    for name, stat in aggregates.items():
+        if stat == "per_member":
+            columns[name] = by_household["sum"].to_numpy()[codes] / hh_members
+        else:
+            columns[name] = by_household[stat].to_numpy()[codes]
+    return columns
@@ -0,0 +1,59 @@
+import pytask
+
+from src.config import BLD
+from src.data_management.columnar_store import read_columnar
+from src.data_management.columnar_store import to_columnar
+
+
+@pytask.mark.depends_on(
+    {
+        "background": BLD / "data" / "liss" / "background.parquet",
+        "compliance": BLD / "data" / "liss" / "compliance.parquet",
+        "infected": BLD / "data" / "liss" / "infected.parquet",
+        "work_status": BLD / "data" / "liss" / "work_status.parquet",
+    }
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "infected_panel.parquet")
+def task_merge_infected_panel(depends_on, produces):
+    infected = read_columnar(depends_on["infected"], ["infected", "Month"])
+    background = read_columnar(depends_on["background"])
+    compliance = read_columnar(
+        depends_on["compliance"], ["compliance_index"]
+    ).reset_index(level="month", drop=True)
+    work_status = read_columnar(
+        depends_on["work_status"], ["work_status", "occupation", "employed"]
+    )
+    infected_panel = (
+        infected.join(background, on="personal_id", how="inner")
+        .join(compliance, on="personal_id", how="inner")
+        .join(work_status, on=["personal_id", "month"], how="inner")
+        .sort_index(level=["personal_id", "month"])
+    )
+    to_columnar(infected_panel, produces)
+
+
+@pytask.mark.depends_on(
+    {
+        "background": BLD / "data" / "liss" / "background.parquet",
+        "compliance": BLD / "data" / "liss" / "compliance.parquet",
+        "work_status": BLD / "data" / "liss" / "work_status.parquet",
+    }
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "compliance_panel.parquet")
+def task_merge_compliance_panel(depends_on, produces):
+    compliance = read_columnar(depends_on["compliance"])
+    background = read_columnar(depends_on["background"])
+    # work status is taken from the April 2020 wave for the March compliance data
+    work_status = (
+        read_columnar(
+            depends_on["work_status"], ["work_status", "occupation", "employed"]
+        )
+        .query("month == '2020-04-01'")
+        .reset_index(level="month", drop=True)
+    )
+    compliance_panel = (
+        compliance.join(background, on="personal_id", how="inner")
+        .join(work_status, on="personal_id", how="inner")
+        .sort_index(level=["personal_id", "month"])
+    )
+    to_columnar(compliance_panel, produces)
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytask
+
+from src.config import BLD
+from src.data_management.columnar_store import memory_usage
+from src.data_management.columnar_store import read_columnar
+
+ARTEFACTS = [
+    "background",
+    "infected",
+    "compliance",
+    "work_status",
+    "essential_worker",
+    "industry",
+    "personality",
+    "politics",
+    "trust",
+    "infected_panel",
+    "compliance_panel",
+]
+
+
+@pytask.mark.depends_on(
+    {name: BLD / "data" / "liss" / f"{name}.parquet" for name in ARTEFACTS}
+)
+@pytask.mark.produces(BLD / "data" / "liss" / "memory_report.csv")
+def task_memory_report(depends_on, produces):
+    # in-memory size of every cleaned frame as the analysis tasks read it back
+    reports = {}
+    for name, path in depends_on.items():
+        data = read_columnar(path)
+        report = memory_usage(data)
+        total = pd.DataFrame(
+            {
+                "memory_mb": report["memory_mb"].sum(),
+                "rows": len(data),
+                "file_mb": path.stat().st_size / 2**20,
+            },
+            index=pd.Index(["Total"], name="column"),
+        )
+        reports[name] = pd.concat([report, total])
+    memory_report = pd.concat(reports, names=["artefact"]).astype({"rows": "Int64"})
+    memory_report.to_csv(produces, float_format="%.3f")
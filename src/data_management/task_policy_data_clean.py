@@ -2,19 +2,53 @@ import pandas as pd
 import pytask
 
 from src.config import BLD
+from src.config import COMPARISON_COUNTRIES
 from src.config import SRC
+from src.data_management.csv_stream import read_csv_filtered
+
+POLICY_INDICATORS = [
+    "C1_School closing",
+    "C2_Workplace closing",
+    "C6_Stay at home requirements",
+]
 
 
 @pytask.mark.depends_on(SRC / "original_data" / "OxCGRT_latest.csv")
-@pytask.mark.produces(BLD / "data" / "policy_stringency.pickle")
+@pytask.mark.produces(
+    {
+        "NLD": BLD / "data" / "policy_stringency.pickle",
+        **{
+            country: BLD / "data" / f"policy_stringency_{country}.pickle"
+            for country in COMPARISON_COUNTRIES
+        },
+    }
+)
 def task_OxCGRT_policy_stringency(depends_on, produces):
-    # policy stringency index
-    policy_data = pd.read_csv(depends_on).query("CountryCode=='NLD'")
-    policy_data["Date"] = pd.to_datetime(
-        policy_data["Date"], format="%Y%m%d", errors="ignore"
+    # policy stringency index, all countries are taken from one pass over the file
+    columns = ["CountryCode", "Jurisdiction", "Date"] + POLICY_INDICATORS
+    policy_data = read_csv_filtered(
+        depends_on,
+        "CountryCode",
+        list(produces),
+        usecols=lambda column: column in columns,
+        dtype={
+            "CountryCode": "category",
+            "Jurisdiction": "category",
+            "Date": str,
+            **{indicator: "float64" for indicator in POLICY_INDICATORS},
+        },
     )
-    policy_data = policy_data.set_index("Date")
-    policy_stringency = policy_data[
-        ["C1_School closing", "C2_Workplace closing", "C6_Stay at home requirements"]
-    ]
-    policy_stringency.to_pickle(produces)
+    policy_data["Date"] = pd.to_datetime(policy_data["Date"], format="%Y%m%d")
+    # only national figures for countries that also report by region
+    if "Jurisdiction" in policy_data:
+        policy_data = policy_data.query("Jurisdiction == 'NAT_TOTAL'")
+
+    missing = set(produces) - set(policy_data["CountryCode"])
+    if missing:
+        raise ValueError(
+            f"No national policy data in {depends_on.name} for the countries "
+            f"{', '.join(sorted(missing))}, check COMPARISON_COUNTRIES."
+        )
+    for country, country_data in policy_data.groupby("CountryCode", observed=True):
+        policy_stringency = country_data.set_index("Date")[POLICY_INDICATORS]
+        policy_stringency.to_pickle(produces[country])
@@ -0,0 +1,81 @@
+"""Month-partitioned store of the cleaned LISS COVID waves.
+
+Every ``covid_data_YYYY_MM.pickle`` in ``original_data/liss`` is a wave. The cleaning
+tasks are parametrized over the waves found there, so a new file is picked up on the
+next build and only its partition is cleaned; the partitions of the other waves are
+unchanged and pytask skips them. A partition is a Parquet file
+``BLD / "data" / "liss" / <data set> / "month=YYYY_MM.parquet"``.
+
+Months are identified by their period "YYYY-MM", the ``Month`` labels of the tables
+are derived from it by :func:`month_labels` once the waves of a data set are stacked.
+
+"""
+
+import re
+
+import pandas as pd
+
+from src.config import BLD
+from src.config import SRC
+from src.data_management.columnar_store import read_columnar
+
+WAVE_FILE = re.compile(r"covid_data_(\d{4}_\d{2})\.pickle")
+
+
+def discover_waves(directory=SRC / "original_data" / "liss", exclude=()):
+    """Find the COVID waves in a directory.
+
+    Args:
+        directory (pathlib.Path): Directory with the wave files.
+        exclude (list): Waves "YYYY_MM" to leave out.
+
+    Returns:
+        dict: Paths of the wave files by wave, sorted by wave.
+
+    """
+    waves = {}
+    for path in directory.glob("covid_data_*.pickle"):
+        match = WAVE_FILE.fullmatch(path.name)
+        if match and match.group(1) not in exclude:
+            waves[match.group(1)] = path
+    return dict(sorted(waves.items()))
+
+
+def partition_path(dataset, wave):
+    """Path of the partition of a wave in a data set."""
+    return BLD / "data" / "liss" / dataset / f"month={wave}.parquet"
+
+
+def read_partitions(paths, columns=None):
+    """Read and stack the partitions of a data set, skipping empty ones.
+
+    Args:
+        paths (list): Partition files in the order to stack them.
+        columns (list, optional): Columns to read. Default None reads all columns.
+
+    Returns:
+        pandas.DataFrame: The stacked partitions.
+
+    """
+    partitions = [read_columnar(path, columns) for path in paths]
+    non_empty = [partition for partition in partitions if len(partition)]
+    return pd.concat(non_empty or partitions[:1])
+
+
+def month_labels(months):
+    """Label months by their name, with the year if a name occurs in several years.
+
+    Args:
+        months (array-like): Months as timestamps or monthly periods.
+
+    Returns:
+        pandas.Categorical: Labels like "April", or "April 2021" for every month if
+            the months of one name fall into different years, ordered by period.
+
+    """
+    periods = pd.PeriodIndex(months, freq="M")
+    unique = periods.unique().sort_values()
+    label = "%B %Y" if unique.month.nunique() < len(unique) else "%B"
+    return pd.Categorical(
+        periods.strftime(label), categories=unique.strftime(label), ordered=True
+    )
@@ -0,0 +1,114 @@
+"""Household cluster bootstrap of logit models on a prebuilt design matrix.
+
+A replicate draws households with replacement. Instead of copying the rows of the
+drawn households, every row is weighted by how often its household was drawn, and the
+logit is refitted by weighted Newton steps on the design matrix of the full sample.
+Each replicate gets its own child of a :class:`numpy.random.SeedSequence`, so the
+draws do not depend on how the replicates are split over worker processes, and the
+replicates are cached by :mod:`src.model_code.fit_cache` on the design, the clusters,
+the seed and the solver options.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.config import BOOTSTRAP_REPLICATES
+from src.config import BOOTSTRAP_SEED
+from src.config import MAX_WORKERS
+from src.model_code.fit_cache import content_key
+from src.model_code.fit_cache import load_cached
+from src.model_code.fit_cache import store_cached
+from src.model_code.parallel import map_models
+
+
+def cluster_bootstrap(
+    design,
+    groups,
+    n_replicates=BOOTSTRAP_REPLICATES,
+    seed=BOOTSTRAP_SEED,
+    start_params=None,
+    maxiter=35,
+    max_workers=MAX_WORKERS,
+):
+    """Bootstrap the parameters of a logit model by resampling clusters.
+
+    Args:
+        design (tuple): Outcome and design matrix from
+            :func:`src.model_code.regression.design_matrices`.
+        groups (pandas.Series): Cluster of each observation, e.g. ``hh_id``, on the
+            index of the data the design was built from.
+        n_replicates (int): Number of bootstrap replicates.
+        seed (int): Seed of the replicates.
+        start_params (array-like, optional): Starting values, usually the estimates
+            on the full sample. Default None starts at zero.
+        maxiter (int): Maximum number of Newton steps per replicate.
+        max_workers (int): Upper bound on worker processes.
+
+    Returns:
+        tuple: Parameters of shape ``(n_replicates, n_params)`` and a boolean array
+            marking the replicates whose fit converged. A replicate which did not
+            converge within ``maxiter`` steps, e.g. because the drawn households
+            separate a rare category, keeps its last iterate; only replicates with a
+            singular Hessian are NaN.
+
+    """
+    y, x = design
+    codes, clusters = pd.factorize(groups.reindex(x.index))
+    if (codes < 0).any():
+        raise ValueError("Every observation of the design needs a cluster.")
+    if start_params is None:
+        start_params = np.zeros(x.shape[1])
+
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    start_params = np.asarray(start_params, dtype=float)
+    key = content_key(
+        "cluster_bootstrap", y, x, codes, n_replicates, seed, start_params, maxiter
+    )
+    cached = load_cached(key)
+    if cached is not None:
+        return cached
+
+    seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+    batches = [
+        (y, x, codes, len(clusters), start_params, maxiter, batch_seeds)
+        for batch_seeds in np.array_split(seeds, max(1, min(max_workers, n_replicates)))
+        if len(batch_seeds)
+    ]
+    fits = map_models(_bootstrap_batch, batches, max_workers=max_workers)
+    replicates = (
+        np.vstack([params for params, _ in fits]),
+        np.concatenate([converged for _, converged in fits]),
+    )
+    store_cached(key, replicates)
+    return replicates
+
+
+def _bootstrap_batch(batch):
+    y, x, codes, n_clusters, start_params, maxiter, seeds = batch
+    params = np.full((len(seeds), x.shape[1]), np.nan)
+    converged = np.zeros(len(seeds), dtype=bool)
+    for i, seed in enumerate(seeds):
+        draws = np.random.default_rng(seed).integers(n_clusters, size=n_clusters)
+        weights = np.bincount(draws, minlength=n_clusters)[codes]
+        params[i], converged[i] = _weighted_logit(y, x, weights, start_params, maxiter)
+    return params, converged
+
+
+def _weighted_logit(y, x, weights, start_params, maxiter, tol=1e-8):
+    from scipy.special import expit
+
+    params = start_params.copy()
+    for _ in range(maxiter):
+        prob = expit(x @ params)
+        gradient = x.T @ (weights * (y - prob))
+        hessian = (x.T * (weights * prob * (1 - prob))) @ x
+        try:
+            step = np.linalg.solve(hessian, gradient)
+        except np.linalg.LinAlgError:
+            return np.full_like(params, np.nan), False
+        params += step
+        if np.abs(step).max() < tol:
+            return params, True
+    return params, False
@@ -0,0 +1,142 @@
+"""Descriptive statistics of the ``stat_*`` tables in a single pass over the data.
+
+Count, sum, mean, standard deviation, minimum and maximum of every variable (and every
+group, if requested) are accumulated together. Numeric columns are processed in
+chunks whose moments are merged with the pairwise update of Chan, Golub and LeVeque,
+which keeps the variance accurate for large means. Categorical columns are summarised
+as indicators of their categories from the category codes, without building dummy
+columns: the statistics of an indicator follow from the category counts.
+
+"""
+
+import numpy as np
+import pandas as pd
+
+STATISTICS = ["Observations", "Mean", "Std", "Min", "Max", "Sum"]
+
+
+def describe(data, columns=(), categorical=None, by=None, chunksize=1_000_000):
+    """Compute descriptive statistics of variables, optionally by group.
+
+    Args:
+        data (pandas.DataFrame): Data set.
+        columns (list): Numeric columns. Missing values are not counted.
+        categorical (dict, optional): Categorical columns and the prefix of their
+            indicators, which are named "prefix:category" as by
+            ``pandas.get_dummies(..., prefix_sep=":")``. A missing value counts as an
+            observation with all indicators zero.
+        by (list, optional): Columns to group by. Groups are sorted.
+        chunksize (int): Rows of numeric columns processed at once.
+
+    Returns:
+        pandas.DataFrame: One row per variable, or per group and variable with the
+            grouping columns as leading index levels before "variable", and the columns
+            Observations, Mean, Std, Min, Max and Sum.
+
+    """
+    categorical = {} if categorical is None else categorical
+    if by is None:
+        group_codes = np.zeros(len(data), dtype=np.intp)
+        groups = [()]
+    else:
+        group_codes, groups = pd.MultiIndex.from_frame(data[by]).factorize(sort=True)
+    n_groups = len(groups)
+
+    records = {}
+    for column in columns:
+        values = data[column].to_numpy(dtype=float, na_value=np.nan)
+        integer = data[column].dtype.kind in "biu"
+        moments = _numeric_moments(values, group_codes, n_groups, chunksize)
+        for group, stats in zip(groups, _statistics(*moments, integer)):
+            records[(*group, column)] = stats
+
+    group_sizes = np.bincount(group_codes, minlength=n_groups)
+    for column, prefix in categorical.items():
+        codes = data[column].cat.codes.to_numpy()
+        categories = data[column].cat.categories
+        observed = codes >= 0
+        counts = np.bincount(
+            group_codes[observed] * len(categories) + codes[observed],
+            minlength=n_groups * len(categories),
+        ).reshape(n_groups, len(categories))
+        for k, category in enumerate(categories):
+            moments = _indicator_moments(counts[:, k], group_sizes)
+            for group, stats in zip(groups, _statistics(*moments, True)):
+                records[(*group, f"{prefix}:{category}")] = stats
+
+    index = [
+        (*group, name)
+        for name in _names(columns, categorical, data)
+        for group in groups
+    ]
+    out = pd.DataFrame([records[key] for key in index], columns=STATISTICS)
+    if by is None:
+        return out.set_axis(pd.Index([name for (name,) in index]), axis="index")
+    return out.set_axis(
+        pd.MultiIndex.from_tuples(index, names=[*by, "variable"]), axis="index"
+    )
+
+
+def _names(columns, categorical, data):
+    names = list(columns)
+    for column, prefix in categorical.items():
+        names += [f"{prefix}:{category}" for category in data[column].cat.categories]
+    return names
+
+
+def _numeric_moments(values, group_codes, n_groups, chunksize):
+    count = np.zeros(n_groups)
+    total = np.zeros(n_groups)
+    mean = np.zeros(n_groups)
+    m2 = np.zeros(n_groups)
+    minimum = np.full(n_groups, np.inf)
+    maximum = np.full(n_groups, -np.inf)
+    for start in range(0, len(values), chunksize):
+        chunk = values[start : start + chunksize]
+        codes = group_codes[start : start + chunksize]
+        observed = ~np.isnan(chunk)
+        chunk, codes = chunk[observed], codes[observed]
+
+        chunk_count = np.bincount(codes, minlength=n_groups).astype(float)
+        chunk_total = np.bincount(codes, weights=chunk, minlength=n_groups)
+        chunk_mean = np.divide(
+            chunk_total, chunk_count, out=np.zeros(n_groups), where=chunk_count > 0
+        )
+        chunk_m2 = np.bincount(
+            codes, weights=(chunk - chunk_mean[codes]) ** 2, minlength=n_groups
+        )
+        np.minimum.at(minimum, codes, chunk)
+        np.maximum.at(maximum, codes, chunk)
+
+        # merge the moments of the chunk into the running moments
+        new_count = count + chunk_count
+        weight = np.divide(
+            chunk_count, new_count, out=np.zeros(n_groups), where=new_count > 0
+        )
+        delta = chunk_mean - mean
+        mean = mean + delta * weight
+        m2 = m2 + chunk_m2 + delta**2 * count * weight
+        count = new_count
+        total = total + chunk_total
+    return count, total, mean, m2, minimum, maximum
+
+
+def _indicator_moments(count_ones, group_sizes):
+    count = group_sizes.astype(float)
+    total = count_ones.astype(float)
+    mean = np.divide(total, count, out=np.zeros(len(count)), where=count > 0)
+    m2 = count * mean * (1 - mean)
+    minimum = np.where(count_ones < group_sizes, 0.0, 1.0)
+    maximum = np.where(count_ones > 0, 1.0, 0.0)
+    return count, total, mean, m2, minimum, maximum
+
+
+def _statistics(count, total, mean, m2, minimum, maximum, integer):
+    for n, s, mu, ss, lo, hi in zip(count, total, mean, m2, minimum, maximum):
+        if n == 0:
+            yield [0, np.nan, np.nan, np.nan, np.nan, 0]
+            continue
+        std = np.sqrt(ss / (n - 1)) if n > 1 else np.nan
+        if integer:
+            lo, hi, s = int(lo), int(hi), int(round(s))
+        yield [int(n), mu, std, lo, hi, s]
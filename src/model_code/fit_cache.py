@@ -0,0 +1,190 @@
+"""Content-addressed on-disk cache of fitted maximum likelihood models.
+
+A fit is keyed on a hash of the estimation data of the model (after missing values
+were dropped), its variable names and formula, the model class and distribution, the
+solver options and the covariance options. The cache stores the estimates, their
+covariance and the optimizer's return values. On a hit the results object is rebuilt
+without running the optimizer: the model is "fitted" with zero iterations starting at
+the cached estimates, which evaluates the covariance once, and gets the cached return
+values with ``"cached": True`` added. Other results computed from a design, like the
+fits of the batched logit solver and bootstrap draws, are cached as they are with
+:func:`content_key`, :func:`load_cached` and :func:`store_cached`. Files are evicted,
+least recently used first, when the cache grows beyond ``FIT_CACHE_MAX_MB``.
+
+"""
+
+import hashlib
+import os
+import pickle
+import warnings
+
+import numpy as np
+
+from src.config import FIT_CACHE
+from src.config import FIT_CACHE_MAX_MB
+
+CACHE_DIR = FIT_CACHE
+
+
+def fit_key(model, fit_options, cov_options):
+    """Hash of everything a fit depends on.
+
+    Args:
+        model (statsmodels.base.model.LikelihoodModel): Model before fitting.
+        fit_options (dict): Options of ``model.fit``, e.g. method and start values.
+        cov_options (dict): Covariance options of ``model.fit``.
+
+    Returns:
+        str: Hex digest.
+
+    """
+    return content_key(
+        type(model).__module__,
+        type(model).__name__,
+        type(getattr(model, "distr", None)).__name__,
+        getattr(model, "formula", None),
+        model.endog_names,
+        model.exog_names,
+        model.endog,
+        model.exog,
+        *sorted(fit_options.items(), key=lambda item: item[0]),
+        *sorted(cov_options.items(), key=lambda item: item[0]),
+    )
+
+
+def content_key(*values):
+    """Hash of arrays, dicts and values with a stable repr.
+
+    Args:
+        *values: Everything a cached result depends on.
+
+    Returns:
+        str: Hex digest.
+
+    """
+    hasher = hashlib.sha256()
+    for value in values:
+        _update(hasher, value)
+    return hasher.hexdigest()
+
+
+def load_fit(model, key, fit_options, cov_options):
+    """Rebuild the results of a cached fit.
+
+    Args:
+        model (statsmodels.base.model.LikelihoodModel): Model before fitting.
+        key (str): Key from :func:`fit_key`.
+        fit_options (dict): Options of ``model.fit`` used for the cached fit.
+        cov_options (dict): Covariance options of ``model.fit``.
+
+    Returns:
+        statsmodels results or None: The results, None if the fit is not cached.
+
+    """
+    cached = load_cached(key)
+    if cached is None:
+        return None
+
+    options = {**fit_options, "start_params": cached["params"], "maxiter": 0, "disp": 0}
+    with warnings.catch_warnings():
+        # the optimizer reports that zero iterations did not converge
+        warnings.simplefilter("ignore")
+        result = model.fit(**options, **cov_options)
+    # a different statsmodels version could compute the statistics differently
+    if not np.allclose(result.cov_params(), cached["cov_params"], equal_nan=True):
+        return None
+    result.mle_retvals = {**cached["mle_retvals"], "cached": True}
+    return result
+
+
+def store_fit(key, result, max_mb=FIT_CACHE_MAX_MB):
+    """Store a fit and evict old fits beyond the cache size.
+
+    Args:
+        key (str): Key from :func:`fit_key`.
+        result (statsmodels results): Fitted model.
+        max_mb (float): Size limit of the cache in MB, 0 disables the cache.
+
+    """
+    cached = {
+        "params": np.asarray(result.params),
+        "cov_params": np.asarray(result.cov_params()),
+        "mle_retvals": result.mle_retvals,
+    }
+    store_cached(key, cached, max_mb)
+
+
+def load_cached(key):
+    """Load a cached result.
+
+    Args:
+        key (str): Key from :func:`content_key`.
+
+    Returns:
+        object or None: The result, None if it is not cached.
+
+    """
+    path = CACHE_DIR / f"{key}.pickle"
+    try:
+        with open(path, "rb") as file:
+            cached = pickle.load(file)
+        os.utime(path)  # mark as recently used for the eviction
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+    return cached
+
+
+def store_cached(key, value, max_mb=FIT_CACHE_MAX_MB):
+    """Store a picklable result and evict old results beyond the cache size.
+
+    Args:
+        key (str): Key from :func:`content_key`.
+        value (object): Result to store.
+        max_mb (float): Size limit of the cache in MB, 0 disables the cache.
+
+    """
+    if max_mb <= 0:
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # write to a temporary file first so concurrent workers never read partial files
+    path = CACHE_DIR / f"{key}.pickle"
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as file:
+        pickle.dump(value, file)
+    os.replace(tmp_path, path)
+    _evict(max_mb)
+
+
+def _evict(max_mb):
+    files = []
+    for path in CACHE_DIR.glob("*.pickle"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_mb * 2**20:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _update(hasher, value):
+    if isinstance(value, tuple):
+        for item in value:
+            _update(hasher, item)
+    elif isinstance(value, dict):
+        # e.g. the cluster ids in the covariance options, whose repr is abbreviated
+        for item in sorted(value.items(), key=lambda item: item[0]):
+            _update(hasher, item)
+    elif hasattr(value, "__array__") and np.asarray(value).dtype != object:
+        array = np.ascontiguousarray(value)
+        hasher.update(f"{array.dtype}{array.shape}".encode())
+        hasher.update(array.tobytes())
+    elif hasattr(value, "__array__"):
+        hasher.update(repr(np.asarray(value).tolist()).encode())
+    else:
+        hasher.update(repr(value).encode())
+    hasher.update(b"|")
@@ -1,30 +1,36 @@
+import numpy as np
 import pandas as pd
-from statsmodels.iolib.summary2 import summary_col
 
 
-def summary_to_stata_format(summary):
-    summary = pd.DataFrame(summary.tables[1].data)
-    summary = (
-        summary.set_axis(summary.iloc[0].astype(str), axis="columns")
-        .set_index("")
-        .iloc[1:, [0, 1, 3]]
+def summary_to_stata_format(result):
+    # same layout as the parameter table of result.summary(): coefficient with
+    # stars above the standard error in parentheses
+    pvalues = np.char.mod("%.3f", np.asarray(result.pvalues, dtype=float)).astype(float)
+    stars = np.select(
+        [pvalues < 0.01, pvalues < 0.05, pvalues < 0.1], ["***", "**", "*"], ""
+    )
+    coef = np.char.add(_format_number(result.params, prec=4), stars)
+    std_err = np.char.add(np.char.add("(", _format_number(result.bse, prec=3)), ")")
+    return pd.Series(
+        np.column_stack([coef, std_err]).ravel(),
+        index=pd.Index(np.repeat(result.model.exog_names, 2), name=""),
+    )
+
+
+def _format_number(values, prec):
+    # vectorized statsmodels.iolib.summary.forg without the padding
+    values = np.asarray(values, dtype=float)
+    general = (np.abs(values) >= 1e4) | (np.abs(values) < 1e-4)
+    return np.where(
+        general,
+        np.char.mod(f"%.{prec}g", values),
+        np.char.mod(f"%.{prec}f", values),
     )
-    for i in range(len(summary)):
-        if float(summary.iloc[i, 2]) < 0.01:
-            summary.iloc[i, 0] = summary.iloc[i, 0].lstrip() + "***"
-        elif float(summary.iloc[i, 2]) < 0.05:
-            summary.iloc[i, 0] = summary.iloc[i, 0].lstrip() + "**"
-        elif float(summary.iloc[i, 2]) < 0.1:
-            summary.iloc[i, 0] = summary.iloc[i, 0].lstrip() + "*"
-        else:
-            summary.iloc[i, 0] = summary.iloc[i, 0].lstrip()
-        summary.iloc[i, 1] = "(" + summary.iloc[i, 1].lstrip() + ")"
-    summary = summary.drop(columns="P>|z|").stack()
-    summary = summary.reset_index(level=1, drop=True)
-    return summary
 
 
 def sm_results_format(results, model_names):
+    from statsmodels.iolib.summary2 import summary_col
+
     return summary_col(
         results,
         float_format="%.3f",
@@ -44,3 +50,49 @@ def odds_radio_format(odds_radios, model_names):
         axis="columns",
         join="outer",
     ).set_axis(model_names, axis="columns")
+
+
+def odds_radio_ci_format(odds_radios, model_names):
+    # odds ratios with their confidence bounds, one column block per model
+    return pd.concat(
+        odds_radios, axis="columns", join="outer", keys=model_names
+    ).rename_axis(columns=["Model", ""])
+
+
+def fit_info_format(results, model_names):
+    # only what the estimates depend on, timings would change the table on every
+    # build; the wall time of a fit is in result.mle_retvals["fit_seconds"]
+    return pd.DataFrame(
+        [
+            {
+                "Optimizer": result.mle_settings["optimizer"],
+                "Iterations": result.mle_retvals.get("iterations"),
+                "Function calls": result.mle_retvals.get("fcalls"),
+                "Converged": result.mle_retvals["converged"],
+            }
+            for result in results
+        ],
+        index=model_names,
+    ).T
+
+
+def grid_results_format(results):
+    # one row per specification, sample and term, fits that failed are left out
+    return pd.concat(
+        {
+            key: pd.DataFrame(
+                {
+                    "coef": result.params,
+                    "std_err": result.bse,
+                    "p_value": result.pvalues,
+                    "odds_ratio": np.exp(result.params),
+                    "nobs": int(result.nobs),
+                    "pseudo_r2": result.prsquared,
+                    "converged": result.mle_retvals["converged"],
+                }
+            )
+            for key, result in results.items()
+            if result is not None
+        },
+        names=["specification", "sample", "term"],
+    )
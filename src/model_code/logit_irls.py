@@ -0,0 +1,313 @@
+"""Logit models fitted by Newton's method (iteratively reweighted least squares).
+
+``fit_logit`` takes a dense array or a ``scipy.sparse`` design, so dummy-heavy
+designs never have to be densified: the Hessian is accumulated as a sparse product and
+only its k x k result is dense. The estimates, standard errors and pseudo R-squared are
+the same as those of ``statsmodels.api.Logit`` with the Newton solver, including the
+cluster-robust covariance with the small sample correction of statsmodels.
+
+``fit_logit_batch`` fits one specification on many row subsets of a dense design at
+once. The rows of every subset are gathered into a zero-padded (subsets x rows x
+columns) array, so that a Newton step of all models is a handful of stacked matrix
+products and one batched solve of their Hessians instead of a Python loop over models.
+:class:`LogitResults` has the attributes of statsmodels results which the functions in
+:mod:`src.model_code.format_result` and ``get_odds_radio`` use.
+
+"""
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from scipy import special
+from scipy import stats
+
+
+class LogitModel:
+    """Variable names of a fitted logit, as on a statsmodels model."""
+
+    def __init__(self, endog_name, exog_names):
+        self.endog_names = endog_name
+        self.exog_names = list(exog_names)
+
+
+class LogitResults:
+    """Estimates of a logit with the interface of statsmodels results.
+
+    Args:
+        model (LogitModel): Variable names.
+        params (numpy.ndarray): Estimates.
+        cov_params (numpy.ndarray): Covariance of the estimates.
+        nobs (int): Number of observations.
+        llf (float): Log-likelihood at the estimates.
+        llnull (float): Log-likelihood of the model with only an intercept.
+        mle_retvals (dict): Iterations and convergence of the solver.
+
+    """
+
+    def __init__(self, model, params, cov_params, nobs, llf, llnull, mle_retvals):
+        names = model.exog_names
+        self.model = model
+        self.params = pd.Series(params, index=names)
+        self.bse = pd.Series(np.sqrt(np.diag(cov_params)), index=names)
+        self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(2 * stats.norm.sf(np.abs(self.tvalues)), index=names)
+        self.nobs = float(nobs)
+        self.llf = llf
+        self.llnull = llnull
+        self.prsquared = 1 - llf / llnull
+        self.mle_retvals = mle_retvals
+        self.mle_settings = {"optimizer": "irls"}
+        self._cov_params = pd.DataFrame(cov_params, index=names, columns=names)
+
+    def cov_params(self):
+        return self._cov_params
+
+    def conf_int(self, alpha=0.05):
+        q = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame(
+            {0: self.params - q * self.bse, 1: self.params + q * self.bse}
+        )
+
+    def summary(self):
+        from statsmodels.iolib.summary2 import Summary
+        from statsmodels.iolib.summary2 import summary_params
+
+        summary = Summary()
+        summary.add_title("Logit Regression Results")
+        summary.add_dict(
+            {
+                "Dep. Variable:": str(self.model.endog_names),
+                "No. Observations:": str(int(self.nobs)),
+                "Pseudo R-squ.:": f"{self.prsquared:.4f}",
+                "Log-Likelihood:": f"{self.llf:.4f}",
+                "Converged:": str(self.mle_retvals["converged"]),
+            }
+        )
+        summary.add_df(summary_params(self, use_t=False))
+        return summary
+
+
+def fit_logit(
+    x,
+    y,
+    exog_names,
+    endog_name="y",
+    groups=None,
+    start_params=None,
+    maxiter=35,
+    tol=1e-8,
+):
+    """Fit a logit by Newton's method.
+
+    Args:
+        x (numpy.ndarray or scipy.sparse.spmatrix): Design with an intercept column.
+        y (numpy.ndarray): Outcome of zeros and ones.
+        exog_names (list): Names of the columns of ``x``.
+        endog_name (str): Name of the outcome.
+        groups (numpy.ndarray, optional): Cluster of every row for a cluster-robust
+            covariance. Default None is the covariance of the maximum likelihood
+            estimator.
+        start_params (numpy.ndarray, optional): Start values, default zeros.
+        maxiter (int): Maximum number of Newton steps.
+        tol (float): Convergence tolerance on the largest change of an estimate.
+
+    Returns:
+        LogitResults: The fit.
+
+    """
+    sparse = scipy.sparse.issparse(x)
+    if sparse:
+        x = scipy.sparse.csr_matrix(x)
+    y = np.asarray(y, dtype=float)
+    params = np.zeros(x.shape[1]) if start_params is None else np.asarray(start_params)
+
+    converged = False
+    for iteration in range(1, maxiter + 1):
+        prob = special.expit(x @ params)
+        step = np.linalg.solve(_hessian(x, prob), x.T @ (y - prob))
+        params = params + step
+        if np.max(np.abs(step)) < tol:
+            converged = True
+            break
+
+    prob = special.expit(x @ params)
+    hessian_inv = np.linalg.inv(_hessian(x, prob))
+    if groups is None:
+        cov_params = hessian_inv
+    else:
+        scores = scipy.sparse.diags(y - prob) @ x if sparse else x * (y - prob)[:, None]
+        cov_params = _cluster_cov(hessian_inv, scores, groups)
+
+    return LogitResults(
+        LogitModel(endog_name, exog_names),
+        params,
+        cov_params,
+        nobs=len(y),
+        llf=_loglike(y, prob),
+        llnull=_loglike(y, np.full(len(y), y.mean())),
+        mle_retvals={"iterations": iteration, "converged": converged},
+    )
+
+
+def fit_logit_batch(
+    x, y, masks, exog_names, endog_name="y", groups=None, maxiter=35, tol=1e-8
+):
+    """Fit the same logit on several row subsets at once.
+
+    Args:
+        x (numpy.ndarray): Design with an intercept column.
+        y (numpy.ndarray): Outcome of zeros and ones.
+        masks (list): Boolean arrays selecting the rows of every model. Every subset
+            is padded to the size of the largest, so the solver is meant for disjoint
+            subsets of similar size, like the months of a panel.
+        exog_names (list): Names of the columns of ``x``.
+        endog_name (str): Name of the outcome.
+        groups (numpy.ndarray, optional): Cluster of every row for a cluster-robust
+            covariance.
+        maxiter (int): Maximum number of Newton steps.
+        tol (float): Convergence tolerance on the largest change of an estimate.
+
+    Returns:
+        list: A :class:`LogitResults` per subset, None if the subset does not
+            identify the model, e.g. if a column is constant in it.
+
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    rows = [np.flatnonzero(mask) for mask in masks]
+    n_models, n_params = len(rows), x.shape[1]
+    index = np.zeros((n_models, max(len(r) for r in rows)), dtype=np.intp)
+    valid = np.zeros(index.shape, dtype=bool)
+    for k, model_rows in enumerate(rows):
+        index[k, : len(model_rows)] = model_rows
+        valid[k, : len(model_rows)] = True
+    # padded rows are zero and do not contribute to the scores and Hessians
+    xs = x[index] * valid[..., None]
+    ys = y[index] * valid
+
+    identified = np.linalg.matrix_rank(xs) == n_params
+    params = np.zeros((n_models, n_params))
+    iterations = np.zeros(n_models, dtype=int)
+    converged = np.zeros(n_models, dtype=bool)
+    for _ in range(maxiter):
+        prob = special.expit(np.einsum("kmp,kp->km", xs, params))
+        score = np.einsum("kmp,km->kp", xs, ys - prob)
+        step = _batch_solve(_batch_hessian(xs, prob), score, identified)
+        active = identified & ~converged
+        params[active] += step[active]
+        iterations[active] += 1
+        converged |= identified & (np.max(np.abs(step), axis=1) < tol)
+        if not (identified & ~converged).any():
+            break
+
+    prob = special.expit(np.einsum("kmp,kp->km", xs, params))
+    hessian = _batch_hessian(xs, prob)
+    hessian_inv = np.full(hessian.shape, np.nan)
+    # the Hessian of a model with (quasi-)separated outcomes can be numerically
+    # singular, like statsmodels the pseudo-inverse is used then
+    hessian_inv[identified] = np.linalg.pinv(hessian[identified], hermitian=True)
+    if groups is None:
+        cov_params = hessian_inv
+    else:
+        scores = xs * (ys - prob)[..., None]
+        cov_params = _batch_cluster_cov(hessian_inv, scores, valid, groups, index)
+
+    nobs = valid.sum(axis=1)
+    prob_null = ys.sum(axis=1, keepdims=True) / nobs[:, None]
+    llf = _batch_loglike(ys, prob, valid)
+    llnull = _batch_loglike(ys, np.broadcast_to(prob_null, ys.shape), valid)
+    model = LogitModel(endog_name, exog_names)
+    return [
+        (
+            LogitResults(
+                model,
+                params[k],
+                cov_params[k],
+                nobs=nobs[k],
+                llf=llf[k],
+                llnull=llnull[k],
+                mle_retvals={
+                    "iterations": int(iterations[k]),
+                    "converged": bool(converged[k]),
+                },
+            )
+            if identified[k]
+            else None
+        )
+        for k in range(n_models)
+    ]
+
+
+def _hessian(x, prob):
+    # negative Hessian of the log-likelihood, X' W X
+    weights = prob * (1 - prob)
+    if scipy.sparse.issparse(x):
+        return (x.T @ scipy.sparse.diags(weights) @ x).toarray()
+    return (x.T * weights) @ x
+
+
+def _cluster_cov(hessian_inv, scores, groups):
+    # sandwich with the scores summed by cluster and the correction of statsmodels,
+    # G / (G - 1) * (N - 1) / (N - K)
+    codes, clusters = pd.factorize(np.asarray(groups))
+    n_clusters, (nobs, k_params) = len(clusters), scores.shape
+    membership = scipy.sparse.csr_matrix(
+        (np.ones(nobs), (codes, np.arange(nobs))), shape=(n_clusters, nobs)
+    )
+    cluster_scores = membership @ scores
+    if scipy.sparse.issparse(cluster_scores):
+        cluster_scores = cluster_scores.toarray()
+    meat = cluster_scores.T @ cluster_scores
+    correction = n_clusters / (n_clusters - 1) * (nobs - 1) / (nobs - k_params)
+    return correction * hessian_inv @ meat @ hessian_inv
+
+
+def _batch_hessian(xs, prob):
+    return np.matmul(xs.transpose(0, 2, 1) * (prob * (1 - prob))[:, None, :], xs)
+
+
+def _batch_solve(hessian, score, identified):
+    # unidentified models get no step, the small ridge of the statsmodels Newton
+    # solver keeps the Hessians of separated models invertible
+    step = np.zeros(score.shape)
+    hessian = hessian[identified] + 1e-10 * np.eye(score.shape[1])
+    step[identified] = np.linalg.solve(hessian, score[identified, :, None])[..., 0]
+    return step
+
+
+def _batch_cluster_cov(hessian_inv, scores, valid, groups, index):
+    # sum the scores by (model, cluster), then pad the clusters of every model into
+    # a (models x clusters x params) array for a stacked outer product
+    codes, clusters = pd.factorize(np.asarray(groups))
+    n_models, _, n_params = scores.shape
+    model_of_row = np.broadcast_to(np.arange(n_models)[:, None], valid.shape)[valid]
+    keys, key_codes = np.unique(
+        model_of_row * len(clusters) + codes[index[valid]], return_inverse=True
+    )
+    membership = scipy.sparse.csr_matrix(
+        (np.ones(len(key_codes)), (key_codes, np.arange(len(key_codes)))),
+        shape=(len(keys), len(key_codes)),
+    )
+    cluster_scores = membership @ scores[valid]
+    model_of_key = keys // len(clusters)
+    n_clusters = np.bincount(model_of_key, minlength=n_models)
+    position = np.arange(len(keys)) - np.repeat(
+        np.cumsum(n_clusters) - n_clusters, n_clusters
+    )
+    padded = np.zeros((n_models, n_clusters.max(), n_params))
+    padded[model_of_key, position] = cluster_scores
+    meat = np.matmul(padded.transpose(0, 2, 1), padded)
+
+    nobs = valid.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correction = n_clusters / (n_clusters - 1) * (nobs - 1) / (nobs - n_params)
+    return correction[:, None, None] * hessian_inv @ meat @ hessian_inv
+
+
+def _batch_loglike(ys, prob, valid):
+    return np.sum(
+        (special.xlogy(ys, prob) + special.xlogy(1 - ys, 1 - prob)) * valid, axis=1
+    )
+
+
+def _loglike(y, prob):
+    return np.sum(special.xlogy(y, prob) + special.xlogy(1 - y, 1 - prob))
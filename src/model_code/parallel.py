@@ -0,0 +1,33 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import MAX_WORKERS
+
+
+def map_models(func, samples, max_workers=MAX_WORKERS, initializer=None, initargs=()):
+    """Apply a fitting function to several samples, in a process pool if allowed.
+
+    Args:
+        func (callable): Picklable function taking one sample.
+        samples (list): Samples to fit.
+        max_workers (int, optional): Upper bound on worker processes. The pool never
+            uses more workers than samples or CPUs, and 1 fits serially.
+        initializer (callable, optional): Picklable function called with
+            ``initargs`` once in every worker before it fits, or once in this
+            process if the samples are fitted serially. Data which all samples share
+            is sent to the workers this way once instead of with every sample.
+        initargs (tuple): Arguments of ``initializer``.
+
+    Returns:
+        list: Return values of ``func`` in the order of ``samples``.
+
+    """
+    n_workers = min(max_workers, len(samples), os.cpu_count() or 1)
+    if n_workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(sample) for sample in samples]
+    with ProcessPoolExecutor(
+        max_workers=n_workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        return list(executor.map(func, samples))
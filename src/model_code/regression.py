@@ -1,86 +1,448 @@
+"""Regression models of the analysis tasks.
+
+statsmodels, patsy and scipy are imported inside the functions which fit or build
+designs, not at module level: pytask imports every task module when it collects the
+build, and a build which fits nothing should not pay for these imports.
+
+"""
+
+import itertools
+import time
+
 import numpy as np
-import statsmodels.api as sm
-from statsmodels.miscmodels.ordinal_model import OrderedModel
+import pandas as pd
+
+from src.model_code.fit_cache import content_key
+from src.model_code.fit_cache import fit_key
+from src.model_code.fit_cache import load_cached
+from src.model_code.fit_cache import load_fit
+from src.model_code.fit_cache import store_cached
+from src.model_code.fit_cache import store_fit
 
 
-def binomial_logit_regression(x, y, intercept=True):
+def binomial_logit_regression(
+    x, y, intercept=True, start_params=None, method="newton", maxiter=35, groups=None
+):
+    import statsmodels.api as sm
+
     if intercept:
         x = sm.add_constant(x)  # add constant if need intercept
     # run regression
     model = sm.Logit(y, x)
-    result = model.fit()
+    result = _fit(
+        model, groups, start_params=start_params, method=method, maxiter=maxiter
+    )
     summary = result.summary()
     odds_radio = get_odds_radio(result)
     return result, summary, odds_radio
 
 
-def binomial_logit_regression_formula(data, formula):
+def binomial_logit_regression_formula(
+    data, formula, start_params=None, method="newton", maxiter=35, groups=None
+):
+    import statsmodels.api as sm
+
     model = sm.Logit.from_formula(formula=formula, data=data)
-    result = model.fit()
+    result = _fit(
+        model, groups, start_params=start_params, method=method, maxiter=maxiter
+    )
+    summary = result.summary()
+    odds_radio = get_odds_radio(result)
+    return result, summary, odds_radio
+
+
+def design_matrices(data, formula):
+    from patsy import dmatrices
+
+    # evaluate the formula once on the full data, category levels are then the
+    # same for every subset fitted with subset_design
+    y, x = dmatrices(formula, data, return_type="dataframe")
+    return y.iloc[:, 0], x
+
+
+def subset_design(design, mask):
+    y, x = design
+    return y[mask], x[mask]
+
+
+def binomial_logit_regression_design(design, **fit_options):
+    y, x = design
+    return binomial_logit_regression(x, y, intercept=False, **fit_options)
+
+
+def binomial_logit_regression_subsets(design, masks, groups=None, maxiter=35):
+    from src.model_code.logit_irls import fit_logit_batch
+
+    # all subsets are fitted together by the batched Newton solver of
+    # src.model_code.logit_irls, unidentified subsets are None. Like the fits of
+    # _fit, every subset is cached on its rows of the design, so only the subsets
+    # whose data changed are fitted again
+    y, x = design
+    y_values, x_values = y.to_numpy(dtype=float), x.to_numpy(dtype=float)
+    if groups is not None:
+        groups = groups.reindex(x.index).to_numpy()
+    keys = [
+        content_key(
+            "fit_logit_batch",
+            y.name,
+            list(x.columns),
+            y_values[mask],
+            x_values[mask],
+            None if groups is None else groups[mask],
+            maxiter,
+        )
+        for mask in masks
+    ]
+    results = [load_cached(key) for key in keys]
+    for result in results:
+        if result is not None:
+            result.mle_retvals = {**result.mle_retvals, "cached": True}
+    missing = [k for k, result in enumerate(results) if result is None]
+    if missing:
+        fitted = fit_logit_batch(
+            x_values,
+            y_values,
+            [masks[k] for k in missing],
+            list(x.columns),
+            endog_name=y.name,
+            groups=groups,
+            maxiter=maxiter,
+        )
+        for k, result in zip(missing, fitted):
+            if result is not None:
+                store_cached(keys[k], result)
+            results[k] = result
+    return results
+
+
+def sparse_design_matrices(
+    data, endog, numeric=(), categorical=None, interactions=(), intercept=True
+):
+    """Build a sparse design without dense dummy columns.
+
+    Indicators of categorical columns are built from the category codes, leaving out
+    the first category, and interactions with :func:`interaction_block`. Rows with a
+    missing value in one of the variables are dropped.
+
+    The path is opt-in: the analysis tasks and the specification grids fit patsy
+    formulas, whose column names the tables use, and no task calls this function or
+    :func:`sparse_logit_regression`. :mod:`src.benchmarks.benchmark_tasks` measures
+    both on the infection model with education x age interactions.
+
+    Args:
+        data (pandas.DataFrame): Data set.
+        endog (str): Outcome column.
+        numeric (list): Numeric regressors.
+        categorical (dict, optional): Categorical regressors and the prefix of their
+            indicators, which are named "prefix:category".
+        interactions (list): Tuples of regressors to interact.
+        intercept (bool): Add an intercept column.
+
+    Returns:
+        tuple: The outcome as a pandas.Series, the design as a
+            ``scipy.sparse.csr_matrix`` and the list of its column names.
+
+    """
+    import scipy.sparse
+
+    categorical = {} if categorical is None else categorical
+    variables = [
+        endog,
+        *numeric,
+        *categorical,
+        *[t for term in interactions for t in term],
+    ]
+    data = data[list(dict.fromkeys(variables))]
+    missing = data.select_dtypes(exclude="category").isna().any(axis=1).to_numpy()
+    for column in data.select_dtypes(include="category"):
+        missing |= data[column].cat.codes.to_numpy() < 0
+    data = data[~missing]
+
+    blocks = [np.ones((len(data), 1))] if intercept else []
+    names = ["Intercept"] if intercept else []
+    blocks += [data[list(numeric)].to_numpy(dtype=float)]
+    names += list(numeric)
+    for column, prefix in categorical.items():
+        codes = data[column].cat.codes.to_numpy()
+        rows = np.flatnonzero(codes > 0)
+        blocks.append(
+            scipy.sparse.csr_matrix(
+                (np.ones(len(rows)), (rows, codes[rows] - 1)),
+                shape=(len(data), len(data[column].cat.categories) - 1),
+            )
+        )
+        names += [f"{prefix}:{c}" for c in data[column].cat.categories[1:]]
+    for terms in interactions:
+        block, block_names = interaction_block(
+            data, *terms, sparse=True, prefixes=categorical
+        )
+        blocks.append(block)
+        names += block_names
+    return data[endog], scipy.sparse.hstack(blocks, format="csr"), names
+
+
+def sparse_logit_regression(y, x, names, groups=None, start_params=None, maxiter=35):
+    from src.model_code.logit_irls import fit_logit
+
+    # Newton's method on the sparse design, see src.model_code.logit_irls
+    if groups is not None:
+        groups = groups.reindex(y.index)
+    result = fit_logit(
+        x,
+        y.to_numpy(),
+        names,
+        endog_name=y.name,
+        groups=groups,
+        start_params=start_params,
+        maxiter=maxiter,
+    )
     summary = result.summary()
     odds_radio = get_odds_radio(result)
     return result, summary, odds_radio
 
 
-def get_odds_radio(result):
+def get_odds_radio(result, bootstrap=None):
     # get Odds Ratio
     conf = result.conf_int()
+    if bootstrap is not None:
+        # percentile intervals of the converged replicates of
+        # src.model_code.bootstrap.cluster_bootstrap. Replicates which did not
+        # converge are mostly separated draws whose estimates diverge, they would end
+        # up in the tails and the bounds would depend on maxiter. Leaving them out
+        # only keeps a 2.5% tail if at most 2.5% of the replicates did not converge,
+        # otherwise the intervals are left out
+        bootstrap_params, converged = bootstrap
+        tail = 0.025
+        if np.sum(~converged) <= tail * len(converged):
+            converged_params = bootstrap_params[converged]
+            conf.iloc[:, 0] = np.nanquantile(converged_params, tail, axis=0)
+            conf.iloc[:, 1] = np.nanquantile(converged_params, 1 - tail, axis=0)
+        else:
+            conf.iloc[:, :] = np.nan
     conf["Odds Ratio"] = result.params
     conf.columns = ["5%", "95%", "Odds Ratio"]
-    return np.exp(conf)
+    odds_radio = np.exp(conf)
+    if bootstrap is not None:
+        odds_radio["Converged replicates"] = int(converged.sum())
+    return odds_radio
+
 
+def ordinal_logit_regression(
+    x, y, start_params=None, method="bfgs", maxiter=500, groups=None, distr="logit"
+):
+    from statsmodels.miscmodels.ordinal_model import OrderedModel
 
-def ordinal_logit_regression(x, y):
-    model = OrderedModel(y, x, distr="logit")
-    result = model.fit(method="bfgs")
+    model = OrderedModel(y, x, distr=distr)
+    result = _fit(
+        model, groups, start_params=start_params, method=method, maxiter=maxiter
+    )
     summary = result.summary()
     odds_radio = get_odds_radio(result)
     return result, summary, odds_radio
 
 
-def ordinal_logit_regression_formula(data, formula):
-    model = OrderedModel.from_formula(formula=formula, data=data)
-    result = model.fit(method="bfgs")
+def ordinal_logit_regression_design(design, **fit_options):
+    y, x = design
+    # the thresholds of the ordered model take the place of the intercept
+    return ordinal_logit_regression(x.drop(columns="Intercept"), y, **fit_options)
+
+
+def ordinal_logit_regression_formula(
+    data,
+    formula,
+    start_params=None,
+    method="bfgs",
+    maxiter=500,
+    groups=None,
+    distr="logit",
+):
+    from statsmodels.miscmodels.ordinal_model import OrderedModel
+
+    model = OrderedModel.from_formula(formula=formula, data=data, distr=distr)
+    result = _fit(
+        model, groups, start_params=start_params, method=method, maxiter=maxiter
+    )
     summary = result.summary()
     odds_radio = get_odds_radio(result)
     return result, summary, odds_radio
 
 
-def ols_regression(x, y, intercept=True):
+def ordered_start_params(ols_result, distr="probit"):
+    from scipy import stats
+
+    # OLS of the category values on the same regressors approximates the latent
+    # index up to scale, the thresholds are then placed at the quantiles of the
+    # observed category frequencies around the mean index
+    distr = {"probit": stats.norm, "logit": stats.logistic}[distr]
+    scale = distr.std() / np.sqrt(ols_result.scale)
+    params = np.asarray(ols_result.params)
+    const_idx = ols_result.model.data.const_idx
+    index = (np.asarray(ols_result.fittedvalues) - params[const_idx]) * scale
+    _, counts = np.unique(ols_result.model.endog, return_counts=True)
+    quantiles = distr.ppf(counts.cumsum()[:-1] / counts.sum())
+    thresholds = index.mean() + quantiles * np.sqrt(1 + index.var() / distr.var())
+    return np.concatenate(
+        [
+            np.delete(params, const_idx) * scale,
+            thresholds[:1],
+            np.log(np.diff(thresholds)),
+        ]
+    )
+
+
+def ordered_start_params_design(design, distr="logit"):
+    y, x = design
+    # starting values of ordinal_logit_regression_design from an OLS fit of the
+    # design, see ordered_start_params
+    ols_result, _ = ols_regression(x, y, intercept=False)
+    return ordered_start_params(ols_result, distr=distr)
+
+
+def _fit(model, groups=None, **fit_options):
+    # an identical fit of an earlier build is loaded from the fit cache
+    cov_options = _cov_options(model, groups)
+    key = fit_key(model, fit_options, cov_options)
+    start = time.perf_counter()
+    result = load_fit(model, key, fit_options, cov_options)
+    if result is not None:
+        result.mle_retvals["fit_seconds"] = time.perf_counter() - start
+        return result
+    # the scipy optimizers do not report their iterations, they are counted by the
+    # callback, which is called once per iteration; it is not part of the cache key
+    iterations = 0
+    callback = fit_options.get("callback")
+
+    def count_iterations(params):
+        nonlocal iterations
+        iterations += 1
+        if callback is not None:
+            callback(params)
+
+    options = {**fit_options, "callback": count_iterations}
+    start = time.perf_counter()
+    result = model.fit(**options, **cov_options)
+    result.mle_retvals["fit_seconds"] = time.perf_counter() - start
+    result.mle_retvals.setdefault("iterations", iterations)
+    store_fit(key, result)
+    return result
+
+
+def _cov_options(model, groups):
+    # cluster-robust covariance, groups is a Series on the index of the data and
+    # is aligned to the rows the model kept after dropping missing values
+    if groups is None:
+        return {}
+    groups = np.asarray(groups.reindex(model.data.row_labels))
+    return {"cov_type": "cluster", "cov_kwds": {"groups": groups}}
+
+
+def ols_regression(x, y, intercept=True, groups=None):
+    import statsmodels.api as sm
+
     if intercept:
         x = sm.add_constant(x)  # add constant if need intercept
     # run regression
     model = sm.OLS(y, x)
-    result = model.fit()
+    result = model.fit(**_cov_options(model, groups))
     summary = result.summary()
     return result, summary
 
 
-def ols_regression_formula(data, formula):
+def ols_regression_formula(data, formula, groups=None):
+    import statsmodels.api as sm
+
     # run regression
     model = sm.OLS.from_formula(formula=formula, data=data)
-    result = model.fit()
+    result = model.fit(**_cov_options(model, groups))
     summary = result.summary()
     return result, summary
 
 
-def add_interaction(x, *interactions):
-    if len(interactions) <= 1:
-        return
-    if len(interactions) == 2:
-        x[interactions[0] + " # " + interactions[1]] = (
-            x[interactions[0]] * x[interactions[1]]
-        )
-    if len(interactions) == 3:
-        x[interactions[0] + " # " + interactions[1]] = (
-            x[interactions[0]] * x[interactions[1]]
-        )
-        x[interactions[0] + " # " + interactions[2]] = (
-            x[interactions[0]] * x[interactions[2]]
-        )
-        x[interactions[1] + " # " + interactions[2]] = (
-            x[interactions[1]] * x[interactions[2]]
-        )
-        x[interactions[0] + " # " + interactions[1] + " # " + interactions[2]] = (
-            x[interactions[0]] * x[interactions[1]] * x[interactions[2]]
-        )
+def interaction_block(
+    data, *terms, max_order=None, sparse=False, drop_first=True, prefixes=None
+):
+    """Build all interactions of two or more terms as one block.
+
+    Every combination of at least two (and at most ``max_order``) terms is
+    interacted, e.g. three terms give three pairwise products and one three-way
+    product. A categorical term expands to indicators of its categories, so each of
+    them is interacted with the other terms. Products are named by joining their
+    factors with " # ", indicators are named "term:category" or "prefix:category".
+
+    Args:
+        data (pandas.DataFrame): Data with the terms as numeric or categorical columns.
+        *terms (str): Columns to interact.
+        max_order (int, optional): Highest order of the products. Default None
+            interacts all terms.
+        sparse (bool): Return a ``scipy.sparse.csc_matrix``, which pays off if the
+            terms are mostly indicators.
+        drop_first (bool): Leave out the first category of categorical terms.
+        prefixes (dict, optional): Prefix of the indicators of categorical terms,
+            default the name of the term.
+
+    Returns:
+        tuple: The products as a (n_rows, n_products) array or sparse matrix and a
+            list of their names.
+
+    """
+    if len(terms) < 2:
+        raise ValueError("An interaction needs at least two terms.")
+    max_order = len(terms) if max_order is None else max_order
+    prefixes = {} if prefixes is None else prefixes
+    factors = [
+        _interaction_factors(data, term, drop_first, prefixes.get(term, term))
+        for term in terms
+    ]
+
+    products = [
+        columns
+        for order in range(2, max_order + 1)
+        for combination in itertools.combinations(factors, order)
+        for columns in itertools.product(*combination)
+    ]
+    names = [" # ".join(name for name, _ in columns) for columns in products]
+
+    if not sparse:
+        block = np.empty((len(data), len(products)), order="F")
+        for j, ((_, first), *rest) in enumerate(products):
+            np.copyto(block[:, j], first)
+            for _, values in rest:
+                block[:, j] *= values
+        return block, names
+
+    import scipy.sparse
+
+    indices, values, indptr = [], [], [0]
+    for columns in products:
+        product = np.multiply.reduce([values for _, values in columns])
+        (nonzero,) = np.nonzero(product)
+        indices.append(nonzero)
+        values.append(product[nonzero])
+        indptr.append(indptr[-1] + len(nonzero))
+    block = scipy.sparse.csc_matrix(
+        (
+            np.concatenate([np.empty(0), *values]),
+            np.concatenate([np.empty(0, dtype=np.intp), *indices]),
+            indptr,
+        ),
+        shape=(len(data), len(products)),
+    )
+    return block, names
+
+
+def add_interaction(x, *interactions, max_order=None):
+    """Return ``x`` with the interactions of :func:`interaction_block` appended."""
+    block, names = interaction_block(x, *interactions, max_order=max_order)
+    return pd.concat([x, pd.DataFrame(block, index=x.index, columns=names)], axis=1)
+
+
+def _interaction_factors(data, term, drop_first, prefix):
+    column = data[term]
+    if not pd.api.types.is_categorical_dtype(column):
+        return [(term, column.to_numpy(dtype=float))]
+    codes = column.cat.codes.to_numpy()
+    categories = column.cat.categories[int(drop_first) :]
+    return [
+        (f"{prefix}:{category}", (codes == k).astype(float))
+        for k, category in enumerate(categories, start=int(drop_first))
+    ]
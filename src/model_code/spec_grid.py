@@ -0,0 +1,107 @@
+"""Fit a grid of model specifications on a grid of samples in one job.
+
+Every formula is evaluated once on the full data, and the samples are row subsets of
+that design matrix. All (formula, sample) fits then run in the process pool of
+:func:`src.model_code.parallel.map_models`. The designs, the fitting function and its
+options are sent once to every worker by the initializer of the pool, a fit only gets
+the name of its formula and the mask of its sample and takes the subset itself.
+Columns which are constant within a sample, like ``female`` among women, and copies of
+other columns are dropped from its design.
+
+"""
+
+import numpy as np
+
+from src.config import MAX_WORKERS
+from src.model_code.parallel import map_models
+from src.model_code.regression import design_matrices
+from src.model_code.regression import subset_design
+
+# designs, fitting function and options of the grid which is run, set in every worker
+_PAYLOAD = {}
+
+
+def run_grid(
+    data, formulas, samples, fit, start=None, max_workers=MAX_WORKERS, **fit_options
+):
+    """Fit every formula on every sample.
+
+    Args:
+        data (pandas.DataFrame): Data with all variables of the formulas and samples.
+        formulas (dict): Formulas by specification name.
+        samples (dict): Samples by name, given as a boolean expression for
+            ``data.eval`` such as ``"Month == 'April'"``, or None for all rows.
+        fit (callable): Picklable function fitting a design, like
+            :func:`src.model_code.regression.binomial_logit_regression_design`.
+        start (callable, optional): Picklable function computing the starting values
+            of ``fit`` from the design of a sample, like
+            :func:`src.model_code.regression.ordered_start_params_design`. Default
+            None leaves them to ``fit``.
+        max_workers (int): Upper bound on worker processes.
+        **fit_options: Keyword arguments of ``fit``.
+
+    Returns:
+        dict: Results by (specification, sample). Fits which failed because the
+            sample does not identify the model are None.
+
+    """
+    designs = {
+        specification: design_matrices(data, formula)
+        for specification, formula in formulas.items()
+    }
+    keys, items = [], []
+    for specification, design in designs.items():
+        for sample, expression in samples.items():
+            if expression is None:
+                mask = np.ones(len(design[0]), dtype=bool)
+            else:
+                mask = data.eval(expression).reindex(design[0].index).to_numpy(bool)
+            keys.append((specification, sample))
+            items.append((specification, mask))
+    try:
+        fits = map_models(
+            _fit_or_none,
+            items,
+            max_workers=max_workers,
+            initializer=_set_payload,
+            initargs=(designs, fit, start, fit_options),
+        )
+    finally:
+        _PAYLOAD.clear()
+    return dict(zip(keys, fits))
+
+
+def _set_payload(designs, fit, start, fit_options):
+    _PAYLOAD.update(designs=designs, fit=fit, start=start, fit_options=fit_options)
+
+
+def _drop_unidentified_columns(design):
+    # constant columns and copies of other columns do not identify a coefficient,
+    # e.g. female:edu repeats edu among women
+    y, x = design
+    values = np.asarray(x.to_numpy(dtype=float), order="F")
+    varying = ~(values == values[:1]).all(axis=0) | (x.columns == "Intercept")
+    # columns are compared by a hash of their bytes, equal hashes are checked
+    keep, seen = [], {}
+    for j in np.flatnonzero(varying):
+        candidates = seen.setdefault(hash(values[:, j].tobytes()), [])
+        if not any(np.array_equal(values[:, j], values[:, k]) for k in candidates):
+            candidates.append(j)
+            keep.append(j)
+    return y, x.iloc[:, keep]
+
+
+def _fit_or_none(item):
+    from statsmodels.tools.sm_exceptions import PerfectSeparationError
+
+    specification, mask = item
+    design = subset_design(_PAYLOAD["designs"][specification], mask)
+    design = _drop_unidentified_columns(design)
+    fit_options = _PAYLOAD["fit_options"]
+    try:
+        if _PAYLOAD["start"] is not None:
+            fit_options = {**fit_options, "start_params": _PAYLOAD["start"](design)}
+        result, _, _ = _PAYLOAD["fit"](design, **fit_options)
+    except (np.linalg.LinAlgError, PerfectSeparationError):
+        return None
+    return result